@@ -1,29 +1,40 @@
+from time import perf_counter
+_RERUN_START = perf_counter()
 
 import os
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
 
-import pandas as pd
 import streamlit as st
 
+# pandas, numpy, ingestion and scoring are imported inside the pages that use them,
+# so the login screen and light pages don't pay for them on a cold start.
 import db
 import auth
-import ingestion
-import scoring
+import instrumentation
+import audit
+
+_IMPORTS_MS = (perf_counter() - _RERUN_START) * 1000
 
 # --------------------------------------------------------------------------------------
 # Page config
 # --------------------------------------------------------------------------------------
 st.set_page_config(page_title="PulseHire ATS", page_icon="💙", layout="wide", initial_sidebar_state="expanded")
 
-# Ensure DB + seed admin (safe if already exists)
-try:
-    db.init_db()
-except Exception:
-    pass
-try:
+@st.cache_resource(show_spinner=False)
+def _bootstrap():
+    """Schema/migrations and the seeded admin, once per process. Returns timings in ms."""
+    timings = {"first_run_imports": _IMPORTS_MS}
+    t = perf_counter()
+    db.ensure_initialized()
+    timings["init_db"] = (perf_counter() - t) * 1000
+    t = perf_counter()
     auth.ensure_seed_admin()
-except Exception:
-    pass
+    timings["seed_admin"] = (perf_counter() - t) * 1000
+    import compliance
+    compliance.start_scheduler()  # weekly retention purge, if PULSEHIRE_RETENTION_AUTORUN=1
+    return timings
+
+STARTUP_TIMINGS = _bootstrap()
 
 # --------------------------------------------------------------------------------------
 # Helpers
@@ -34,6 +45,26 @@ def _assets_path(filename: str) -> str:
 def _has_asset(filename: str) -> bool:
     return os.path.exists(_assets_path(filename))
 
+def _csv_preview(f, rows: int = 20):
+    """Read only the first rows of an upload, leaving it rewound for streaming ingest."""
+    import pandas as pd
+    f.seek(0)
+    df = pd.read_csv(f, nrows=rows)
+    f.seek(0)
+    return df
+
+def _stream_ingest(f, kind: str, is_test: bool) -> int:
+    """Chunked ingest with a live progress bar; resumes a previously interrupted upload."""
+    import ingestion
+    bar = st.progress(0.0)
+    status = st.empty()
+    def report(p):
+        bar.progress(p["fraction"])
+        status.caption(f"{p['rows']:,} rows committed · {p['rows_per_sec']:,.0f} rows/s")
+    n = ingestion.ingest_csv_stream(f, kind, is_test=is_test, progress=report)
+    bar.progress(1.0)
+    return n
+
 # --------------------------------------------------------------------------------------
 # Sidebar navigation (edge-to-edge buttons + centered logo)
 # --------------------------------------------------------------------------------------
@@ -118,22 +149,33 @@ def sidebar_nav():
 # Pages
 # --------------------------------------------------------------------------------------
 def dashboard_ui():
+    import pandas as pd
     st.title("📊 Dashboard")
-    conn = db.get_conn()
-    cur = conn.cursor()
-    try:
-        total_candidates = cur.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
-        total_campaigns  = cur.execute("SELECT COUNT(*) FROM campaigns").fetchone()[0]
-        total_tests      = cur.execute("SELECT COUNT(*) FROM test_scores").fetchone()[0]
-    finally:
-        conn.close()
+    totals = db.stats_totals()
+    def metric(col, label, key):
+        t = totals.get(key, {"all": 0, "test": 0})
+        col.metric(label, t["all"], help=f"{t['test']} test rows" if t["test"] else None)
     c1, c2, c3 = st.columns(3)
-    c1.metric("Candidates", total_candidates)
-    c2.metric("Campaigns", total_campaigns)
-    c3.metric("Assessments", total_tests)
+    metric(c1, "Candidates", "candidates")
+    metric(c2, "Campaigns", "campaigns")
+    metric(c3, "Assessments", "assessments")
     st.caption("Use **Candidates** for applications, **Imports** for TestGorilla & Interview Notes, and **Campaigns** to manage jobs.")
 
+    tab1, tab2 = st.tabs(["Ingest volume", "By source"])
+    with tab1:
+        since = (datetime.utcnow().date() - timedelta(days=90)).isoformat()
+        days = db.stats_by_day("candidates", since=since, is_test=False)
+        if days:
+            st.bar_chart(pd.DataFrame(days).set_index("day")["count"])
+        else:
+            st.info("No candidates ingested in the last 90 days.")
+    with tab2:
+        by_source = db.stats_by_source("candidates")
+        if by_source:
+            st.dataframe(pd.DataFrame(by_source), use_container_width=True)
+
 def campaigns_ui():
+    import pandas as pd
     st.title("🎯 Campaigns")
     st.caption("Create single campaigns or bulk import from CSV.")
 
@@ -186,16 +228,14 @@ def campaigns_ui():
                 if missing:
                     st.error(f"Missing columns: {', '.join(sorted(missing))}")
                 else:
-                    cnt = 0
-                    for _, row in df.iterrows():
-                        db.add_campaign(
-                            name=str(row[cols_lower["name"]]) if pd.notna(row[cols_lower["name"]]) else None,
-                            hours=str(row[cols_lower["hours"]]) if pd.notna(row[cols_lower["hours"]]) else None,
-                            keywords=str(row[cols_lower["keywords"]]) if pd.notna(row[cols_lower["keywords"]]) else None,
-                            notes=str(row[cols_lower["notes"]]) if pd.notna(row[cols_lower["notes"]]) else None
-                        )
-                        cnt += 1
-                    st.success(f"Imported {cnt} campaign(s).")
+                    cols = [cols_lower[c] for c in ("name", "hours", "keywords", "notes")]
+                    rows = df[cols].astype(object).where(df[cols].notna(), None)
+                    rows = [tuple(None if v is None else str(v) for v in r) for r in rows.itertuples(index=False)]
+                    unknown = db.add_campaigns(rows)
+                    st.success(f"Imported {len(rows)} campaign(s).")
+                    if unknown:
+                        st.caption("Not in the keyword list, so not used for ranking until added on the "
+                                   "Scoring page: " + ", ".join(unknown))
             except Exception as e:
                 st.error(f"Failed to import: {e}")
 
@@ -208,44 +248,128 @@ def campaigns_ui():
             st.info("No campaigns yet.")
     except Exception:
         # If list_campaigns not available, display raw query
-        conn = db.get_conn()
-        df = pd.read_sql_query("SELECT id, name, hours, keywords, notes, created_at FROM campaigns ORDER BY created_at DESC", conn)
-        conn.close()
+        with db.connection() as conn:
+            df = pd.read_sql_query("SELECT id, name, hours, keywords, notes, created_at FROM campaigns ORDER BY created_at DESC", conn)
         if df.empty:
             st.info("No campaigns yet.")
         else:
             st.dataframe(df, use_container_width=True)
 
 def active_recruitment_ui():
+    import pandas as pd
     st.title("🚀 Active recruitment")
     st.caption("Quick view of campaigns for day-to-day use.")
     try:
         rows = db.list_campaigns()
     except Exception:
-        conn = db.get_conn()
-        rows = pd.read_sql_query("SELECT id, name, hours, keywords, notes, created_at FROM campaigns ORDER BY created_at DESC", conn).to_dict(orient="records")
-        conn.close()
+        with db.connection() as conn:
+            rows = pd.read_sql_query("SELECT id, name, hours, keywords, notes, created_at FROM campaigns ORDER BY created_at DESC", conn).to_dict(orient="records")
     if not rows:
         st.info("No campaigns yet. Add some in **Campaigns**.")
         return
-    df = pd.DataFrame(rows)
-    q = st.text_input("Filter by name/keywords", key="active_filter")
+    q = st.text_input("Filter by name/keywords", key="active_filter",
+                      help="Part of a campaign name, or a whole keyword (any case).")
     if q:
-        ql = q.lower()
-        df = df[df.apply(lambda r: ql in str(r.get("name","")).lower() or ql in str(r.get("keywords","")).lower(), axis=1)]
+        rows = db.search_campaigns(q.strip())
+        if not rows:
+            st.info("No campaigns match that filter.")
+            return
+    df = pd.DataFrame(rows)
     st.dataframe(df[["name","hours","keywords","notes","created_at"]].sort_values("created_at", ascending=False), use_container_width=True)
 
+    st.subheader("Top candidates for a campaign")
+    import scoring
+    camp = st.selectbox("Campaign", options=df.to_dict(orient="records"), format_func=lambda r: r["name"] or f"#{r['id']}",
+                        key="active_rank_campaign")
+    c1, c2 = st.columns(2)
+    k = c1.number_input("How many", min_value=1, max_value=100, value=10, key="active_rank_k")
+    threshold = c2.slider("Match threshold", min_value=scoring.INDEX_FLOOR, max_value=100, value=85, key="active_rank_thresh")
+    if camp:
+        ranked = scoring.rank_candidates_for_campaign(int(camp["id"]), k=int(k), threshold=threshold, is_test=False)
+        if ranked["missing"]:
+            st.caption("Not in the keyword list: " + ", ".join(ranked["missing"]))
+        if ranked["results"]:
+            st.dataframe(pd.DataFrame(ranked["results"]), use_container_width=True)
+        else:
+            st.info("No indexed candidates match this campaign's keywords yet.")
+        with st.expander("Match index"):
+            st.caption("New candidates, and everyone after a keyword change, are only ranked once indexed.")
+            b1, b2 = st.columns(2)
+            if b1.button("Count unindexed", key="active_rank_count"):
+                st.info(f"{scoring.unindexed_count():,} candidates are not in the match index yet.")
+            if b2.button("Index them now", key="active_rank_refresh"):
+                with st.spinner("Scoring candidates…"):
+                    n = scoring.refresh_match_index()
+                st.success(f"Indexed {n:,} candidates.")
+                st.rerun()
+
+def _export_ui():
+    """Build an export into a temp file (constant memory), then offer it for download.
+
+    st.download_button holds the whole file in the Streamlit server's memory while it is
+    offered; very large exports should use export.export_candidates() directly. Serving the
+    file from Streamlit's static folder would avoid that but bypass the login.
+    """
+    import tempfile
+    import export
+    c1, c2, c3 = st.columns(3)
+    scope = c1.selectbox("Data", ["Live only", "Test only", "Live and test"], key="export_scope")
+    fmt = c2.selectbox("Format", export.FORMATS, key="export_fmt",
+                       help=None if export.parquet_available() else "Install pyarrow for Parquet.")
+    threshold = c3.slider("Keyword score threshold", 70, 100, 85, key="export_thresh",
+                          help="Stored scores at this threshold are included; run Scoring first to fill them.")
+    use_dates = st.checkbox("Limit to application dates", key="export_use_dates")
+    date_from = date_to = None
+    if use_dates:
+        d1, d2 = st.columns(2)
+        date_from = d1.date_input("From", value=datetime.utcnow().date() - timedelta(days=30), key="export_from")
+        date_to = d2.date_input("To", value=datetime.utcnow().date(), key="export_to")
+    if st.button("Prepare export", key="export_btn"):
+        old = st.session_state.pop("export_file", None)
+        if old and os.path.exists(old["path"]):
+            os.remove(old["path"])
+        with tempfile.NamedTemporaryFile(prefix="pulsehire-export-", suffix=f".{fmt}", delete=False) as tmp:
+            path = tmp.name
+        with st.spinner("Exporting…"):
+            n = export.export_candidates(path, fmt=fmt, is_test={"Live only": 0, "Test only": 1}.get(scope),
+                                         date_from=date_from, date_to=date_to, threshold=threshold)
+        st.session_state.export_file = {"path": path, "rows": n, "fmt": fmt}
+    ready = st.session_state.get("export_file")
+    if ready and os.path.exists(ready["path"]):
+        st.caption(f"The download is held in server memory ({os.path.getsize(ready['path']) / 1e6:,.1f} MB). "
+                   "For very large exports, run `export.export_candidates()` on the server instead.")
+        with open(ready["path"], "rb") as f:
+            st.download_button(f"Download {ready['rows']:,} rows ({ready['fmt']})", data=f,
+                               file_name=f"pulsehire_candidates_{datetime.utcnow():%Y%m%d}.{ready['fmt']}",
+                               mime="text/csv" if ready["fmt"] == "csv" else "application/octet-stream",
+                               key="export_dl")
+
 def candidates_upload_ui():
+    import pandas as pd
     st.title("👥 Candidates (Applications)")
+
+    q = st.text_input("🔎 Search resumes and notes", key="cand_search",
+                      placeholder="e.g. zendesk spanish", help="Every word must match (prefixes count).")
+    if q.strip():
+        hits = db.search_candidates(q, limit=50)
+        if hits:
+            st.dataframe(pd.DataFrame(hits).drop(columns=["rank"]), use_container_width=True)
+        else:
+            st.info("No matching candidates.")
+    st.divider()
+
+    with st.expander("⬇️ Export candidates"):
+        _export_ui()
+    st.divider()
+
     st.caption("Bulk upload candidates/applications as CSV.")
     test_flag = st.toggle("Upload as Test", value=False, help="Store uploaded data as test-only.", key="apps_test_toggle")
     f = st.file_uploader("Upload applications CSV", type=["csv"], key="apps_file")
     if f is not None:
-        df = pd.read_csv(f)
         st.write("Preview:")
-        st.dataframe(df.head(20), use_container_width=True)
+        st.dataframe(_csv_preview(f), use_container_width=True)
         if st.button("Ingest applications", key="apps_ingest_btn"):
-            n = ingestion.ingest_applications(df, is_test=test_flag)
+            n = _stream_ingest(f, "applications", test_flag)
             st.success(f"Ingested {n} application rows.")
 
 def imports_ui():
@@ -258,22 +382,23 @@ def imports_ui():
     with tab1:
         tg = st.file_uploader("Upload TestGorilla CSV", type=["csv"], key="imports_tg_file")
         if tg:
-            df = pd.read_csv(tg)
-            st.dataframe(df.head(20), use_container_width=True)
+            st.dataframe(_csv_preview(tg), use_container_width=True)
             if st.button("Import TestGorilla", key="imports_tg_btn"):
-                n = ingestion.ingest_testgorilla(df, is_test=test_flag)
+                n = _stream_ingest(tg, "testgorilla", test_flag)
                 st.success(f"Imported {n} TestGorilla rows.")
 
     with tab2:
         inv = st.file_uploader("Upload Interview Notes CSV", type=["csv"], key="imports_inv_file")
         if inv:
-            df = pd.read_csv(inv)
-            st.dataframe(df.head(20), use_container_width=True)
+            st.dataframe(_csv_preview(inv), use_container_width=True)
             if st.button("Import Interview Notes", key="imports_inv_btn"):
-                n = ingestion.ingest_interview_notes(df, is_test=test_flag)
+                n = _stream_ingest(inv, "interview_notes", test_flag)
                 st.success(f"Imported {n} interview note rows.")
 
 def scoring_ui():
+    import numpy as np
+    import pandas as pd
+    import scoring
     st.title("✨ Keywords & Scoring")
     st.caption("Manage keywords and scoring logic.")
 
@@ -310,34 +435,81 @@ def scoring_ui():
     # Score candidates
     st.divider()
     st.subheader("Score candidates")
-    conn = db.get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id, name, email, source, resume_text, is_test, created_at FROM candidates ORDER BY id DESC LIMIT 500")
-    rows = [dict(zip([c[0] for c in cur.description], r)) for r in cur.fetchall()]
-    conn.close()
+    f1, f2, f3, f4, f5 = st.columns([2, 1, 1, 1, 2])
+    source = f1.text_input("Source", key="cand_f_source").strip() or None
+    test_opt = f2.selectbox("Data", ["All", "Live", "Test"], key="cand_f_test")
+    date_from = f3.date_input("From", value=None, key="cand_f_from")
+    date_to = f4.date_input("To", value=None, key="cand_f_to")
+    email_prefix = f5.text_input("Email starts with", key="cand_f_email").strip() or None
+    filters = {"source": source, "is_test": {"All": None, "Live": 0, "Test": 1}[test_opt],
+               "date_from": date_from.isoformat() if date_from else None,
+               "date_to": date_to.isoformat() if date_to else None,
+               "email_prefix": email_prefix}
+    # Keyset pager: a stack of "after id" cursors, reset whenever the filters change.
+    if st.session_state.get("cand_filters") != filters:
+        st.session_state.cand_filters = filters
+        st.session_state.cand_cursors = [None]
+    cursors = st.session_state.cand_cursors
+    rows, next_cursor = db.list_candidates_page(after_id=cursors[-1], limit=50, **filters)
 
     if not rows:
         st.info("No candidates. Upload some in **Candidates** or via **Imports**.")
         return
 
     df = pd.DataFrame(rows)
-    st.dataframe(df[["id","name","email","source","is_test","created_at"]], use_container_width=True)
+    st.dataframe(df, use_container_width=True)
+    p1, p2, p3 = st.columns([1, 1, 4])
+    if p1.button("◀ Newer", key="cand_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if p2.button("Older ▶", key="cand_next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+    p3.caption(f"Page {len(cursors)}")
 
     to_score = st.multiselect("Select candidates to score", options=df["id"].tolist(), key="score_sel")
     threshold = st.slider("Match threshold", min_value=70, max_value=100, value=85, step=1, key="score_thresh")
+    with st.expander("Tier weights"):
+        wcols = st.columns(3)
+        tier_weights = {t: wcols[t - 1].number_input(f"Tier {t}", min_value=0.0, value=float(w), step=0.5, key=f"score_w{t}")
+                        for t, w in scoring.TIER_WEIGHTS.items()}
 
     if st.button("Run scoring", key="score_btn") and to_score:
-        results = []
-        for cid in to_score:
-            text = df.loc[df["id"] == cid, "resume_text"].values[0]
-            total, hits = scoring.score_text(text or "", threshold=threshold)
-            results.append({"candidate_id": cid, "score": total, "hits": ", ".join([h['term'] for h in hits])})
+        texts = db.get_resume_texts(to_score)
+        if tier_weights == scoring.TIER_WEIGHTS:
+            scoring.score_candidates(to_score, threshold=threshold, texts=texts)
+        ids, idx, matrix = scoring.match_rows(to_score, texts=texts)
+        # Raw similarities don't depend on the slider or weights; keep them for cheap re-filtering.
+        st.session_state.score_matrix = {"ids": ids, "index": idx, "matrix": matrix}
         st.success("Scoring complete.")
-        st.dataframe(pd.DataFrame(results).sort_values("score", ascending=False), use_container_width=True)
+
+    cached = st.session_state.get("score_matrix")
+    if cached and cached["index"].version == scoring.keyword_version():
+        idx = cached["index"]
+        totals, mask = scoring.rethreshold(cached["matrix"], threshold, tier_weights, index=idx)
+        terms = np.array(idx.terms, dtype=object)
+        results = pd.DataFrame({
+            "candidate_id": cached["ids"],
+            "score": totals,
+            "hits": [", ".join(terms[m]) for m in mask],
+        })
+        st.dataframe(results.sort_values("score", ascending=False), use_container_width=True)
+
+    with st.expander("Stored scores at this threshold"):
+        top = db.list_top_scores(scoring.keyword_version(), threshold)
+        if top:
+            for r in top:
+                r["hits"] = ", ".join(h["term"] for h in r["hits"])
+            st.dataframe(pd.DataFrame(top), use_container_width=True)
+        else:
+            st.info("No stored scores for the current keyword set and threshold yet.")
 
 def counties_ui():
+    import pandas as pd
+    import dnc
     st.title("🗺️ Hiring Areas (Counties)")
-    st.caption("Add/remove Irish counties. Multi-add supports commas, semicolons, and new lines.")
+    st.caption("Add/remove Irish counties. Multi-add supports commas, semicolons, and new lines. "
+               "Applicants from recognised counties outside these areas are flagged Do Not Call at upload.")
 
     # Existing
     rows = db.get_counties()
@@ -356,12 +528,11 @@ def counties_ui():
             for line in raw.splitlines():
                 parts.extend(line.replace(";",",").split(","))
             cleaned = [p.strip() for p in parts if p.strip()]
-            if hasattr(db, "add_counties"):
-                db.add_counties(cleaned)
-            else:
-                for c in cleaned:
-                    db.add_county(c)
-            st.success(f"Added {len(cleaned)} counties (existing duplicates ignored).")
+            added = db.add_counties(cleaned)
+            st.success(f"Added {added} counties (existing duplicates ignored).")
+            if added:
+                with st.spinner("Re-checking Do Not Call flags…"):
+                    st.caption(f"{dnc.reevaluate():,} candidates' DNC flags updated.")
 
     with st.form("remove_county"):
         to_remove = st.selectbox("Remove a county", options=[""] + existing, key="counties_rm_sel")
@@ -369,6 +540,31 @@ def counties_ui():
         if rem and to_remove:
             db.remove_county(to_remove)
             st.success(f"Removed {to_remove}")
+            with st.spinner("Re-checking Do Not Call flags…"):
+                st.caption(f"{dnc.reevaluate():,} candidates' DNC flags updated.")
+
+    st.subheader("Do Not Call")
+    n = dnc.counts()
+    st.write(f"{n['dnc']:,} candidates flagged DNC; {n['overrides']:,} manual overrides.")
+    with st.form("dnc_override"):
+        c1, c2 = st.columns([1, 1])
+        cid = c1.number_input("Candidate ID", min_value=1, step=1, key="dnc_cid")
+        choice = c2.selectbox("Status", ["Do not call", "Callable", "Automatic (by county)"], key="dnc_choice")
+        reason = st.text_input("Reason", key="dnc_reason", help="Required for manual Do Not Call.")
+        if st.form_submit_button("Save"):
+            value = {"Do not call": True, "Callable": False}.get(choice)
+            if value is True and not reason.strip():
+                st.error("Please give a reason.")
+            else:
+                try:
+                    dnc.set_override(int(cid), value, reason)
+                    st.success(f"Candidate #{int(cid)} set to {choice.lower()}.")
+                except ValueError as e:
+                    st.error(str(e))
+    overrides_only = st.toggle("Show manual overrides only", key="dnc_overrides_only")
+    rows = dnc.flagged(limit=200, overrides_only=overrides_only)
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
 
 def compliance_ui():
     st.title("⚖️ Compliance")
@@ -402,15 +598,171 @@ Do Not Call with reason; county-based auto‑DNC with manual override; visa/camp
 _Last updated: {}
 """.format(datetime.utcnow().date().isoformat()))
 
+    st.divider()
+    _retention_ui()
+
+def _retention_ui():
+    import pandas as pd
+    import compliance
+    st.subheader("Retention purge")
+    last = compliance.last_run()
+    if compliance.autorun_enabled():
+        schedule = f"Runs automatically every {compliance.RUN_EVERY_DAYS} days."
+    else:
+        schedule = "Automatic runs are off (set PULSEHIRE_RETENTION_AUTORUN=1 to enable)."
+    if last:
+        state = "finished" if last.get("done") else "stopped early (will continue)"
+        st.caption(f"Last run {last['created_at'][:16]} UTC, {state}: {last.get('candidates', 0):,} candidates "
+                   f"deleted in {last.get('batches', 0)} batches. {schedule}")
+    else:
+        st.caption(f"No purge has run yet. {schedule}")
+    c1, c2, c3 = st.columns(3)
+    days = c1.number_input("Retention (days)", min_value=30, value=compliance.RETENTION_DAYS, step=30, key="ret_days")
+    batch = c2.number_input("Batch size", min_value=50, max_value=5000, value=compliance.BATCH_SIZE, step=50,
+                            key="ret_batch", help="Smaller batches hold the write lock for less time.")
+    budget = c3.number_input("Stop after (seconds, 0 = no limit)", min_value=0, value=0, step=30, key="ret_budget")
+    if st.button("Dry run", key="ret_dry"):
+        counts = compliance.purge_expired(retention_days=days, dry_run=True)
+        st.write(f"Would delete everything created before {counts['cutoff'][:10]}:")
+        st.dataframe(pd.DataFrame([{"table": k, "rows": v} for k, v in counts.items()
+                                   if k not in ("cutoff", "dry_run")]), hide_index=True)
+    confirm = st.checkbox("I understand this permanently deletes expired candidates", key="ret_confirm")
+    if st.button("Purge now", key="ret_go", disabled=not confirm):
+        bar, status = st.progress(0.0), st.empty()
+        total = compliance.expired_counts(days)["candidates"] or 1
+        def report(t):
+            bar.progress(min(1.0, t["candidates"] / total))
+            status.caption(f"{t['candidates']:,} candidates deleted in {t['batches']} batches…")
+        user = st.session_state.get("user") or {}
+        try:
+            res = compliance.purge_expired(retention_days=days, batch_size=int(batch), progress=report,
+                                           max_seconds=budget or None, user_id=user.get("id"))
+        except RuntimeError as e:
+            st.warning(str(e))
+        else:
+            bar.progress(1.0 if res["done"] else min(1.0, res["candidates"] / total))
+            st.success(f"Deleted {res['candidates']:,} candidates in {res['batches']} batches"
+                       + ("." if res["done"] else "; stopped at the time limit, run again to continue."))
+
 def changelog_ui():
+    import pandas as pd
+    import changelog
     st.title("🧾 Changelog")
-    st.info("This page will show system updates and changes. (Placeholder)")
+    st.caption("Every insert, update and delete on candidates, campaigns, keywords, counties, "
+               "assessments and interviews, newest first.")
+    c1, c2 = st.columns([4, 1])
+    tables = c1.multiselect("Tables", changelog.TABLES, key="changelog_tables")
+    limit = c2.selectbox("Rows", [50, 100, 250, 500], index=1, key="changelog_limit")
+    # Older pages: a stack of before_seq cursors, reset when the filter changes.
+    page_key = (tuple(tables), limit)
+    if st.session_state.get("changelog_key") != page_key:
+        st.session_state.changelog_key = page_key
+        st.session_state.changelog_cursors = [None]
+    cursors = st.session_state.changelog_cursors
+    rows = changelog.recent_changes(before_seq=cursors[-1], limit=limit, tables=tables)
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    else:
+        st.info("No changes recorded yet." if cursors[-1] is None else "No older changes.")
+    b1, b2, _ = st.columns([1, 1, 4])
+    if b1.button("← Newer", disabled=len(cursors) == 1, key="changelog_newer"):
+        cursors.pop()
+        st.rerun()
+    if b2.button("Older →", disabled=len(rows) < limit, key="changelog_older"):
+        cursors.append(rows[-1]["seq"])
+        st.rerun()
+    st.caption(f"Latest seq: {changelog.latest_seq():,}. Sync jobs read new changes with "
+               "`changelog.changes_since(cursor)` and store the returned cursor.")
 
 def admin_ui():
+    import pandas as pd
     st.title("🛠️ Admin")
     st.caption("Admin actions are available in the Account page below.")
     st.info("Use **Account → Create user** to add users and **Change password** to rotate credentials.")
 
+    st.subheader("Startup timing")
+    last = st.session_state.get("rerun_timings", {})
+    st.dataframe(pd.DataFrame([
+        {"phase": f"bootstrap: {k}", "ms": round(v, 1)} for k, v in STARTUP_TIMINGS.items()
+    ] + [
+        {"phase": f"last rerun: {k}", "ms": round(v, 1)} for k, v in last.items()
+    ]), use_container_width=True)
+
+    st.subheader("Reference-data cache")
+    stats = db.cache_stats()
+    if stats:
+        st.dataframe(pd.DataFrame.from_dict(stats, orient="index"), use_container_width=True)
+
+    st.subheader("Instrumentation")
+    c1, c2, c3 = st.columns([1, 1, 1])
+    on = c1.toggle("Time queries, pages and ingest/score calls", value=instrumentation.ENABLED, key="instr_on")
+    slow = c2.number_input("Slow-query threshold (ms)", min_value=1.0, value=float(instrumentation.SLOW_MS),
+                           step=10.0, key="instr_slow_ms")
+    if slow != instrumentation.SLOW_MS:
+        instrumentation.set_slow_ms(slow)
+    if on != instrumentation.ENABLED:
+        if on:
+            instrumentation.enable()
+        else:
+            instrumentation.disable()
+        db.configure()  # reopen pooled connections with/without the timing class
+    if c3.button("Reset measurements", key="instr_reset"):
+        instrumentation.reset()
+    if instrumentation.ENABLED:
+        st.caption("Percentiles cover each name's last "
+                   f"{instrumentation.WINDOW} samples; counts and totals cover the whole process.")
+        tabs = st.tabs(["Pages", "Ingest & scoring", "SQL statements", "Slow queries"])
+        for tab, kind in zip(tabs[:3], ["page", ("ingest", "score"), "sql"]):
+            kinds = kind if isinstance(kind, tuple) else (kind,)
+            rows = [r for k in kinds for r in instrumentation.summary(k)]
+            with tab:
+                if rows:
+                    st.dataframe(pd.DataFrame(rows).sort_values("total_ms", ascending=False),
+                                 use_container_width=True, hide_index=True)
+                else:
+                    st.info("Nothing recorded yet.")
+        with tabs[3]:
+            slow_rows = instrumentation.slow_queries()
+            if slow_rows:
+                st.dataframe(pd.DataFrame(slow_rows), use_container_width=True, hide_index=True)
+            else:
+                st.info(f"No statements over {instrumentation.SLOW_MS:g} ms.")
+    else:
+        st.caption("Off. Set PULSEHIRE_INSTRUMENT=1 to enable at startup.")
+
+    st.subheader("Duplicate candidates")
+    st.caption(f"{db.count_duplicates():,} candidate records are linked to an earlier record and hidden from "
+               "lists, search and scoring. New uploads are checked automatically.")
+    if st.button("Check existing candidates for duplicates", key="admin_dedupe_btn"):
+        import ingestion
+        with st.spinner("Comparing candidates within matching email / phone / name blocks…"):
+            n = ingestion.resolve_existing_duplicates()
+        st.success(f"Linked {n:,} duplicate records.")
+
+    st.subheader("Audit log")
+    c1, c2, c3, c4 = st.columns([2, 2, 1, 1])
+    action = c1.selectbox("Action", ["(all)"] + audit.actions(), key="audit_action")
+    with db.connection() as conn:
+        users = {r["email"]: r["id"] for r in conn.execute("SELECT id, email FROM users ORDER BY email")}
+    who = c2.selectbox("User", ["(all)"] + list(users), key="audit_user")
+    since = c3.date_input("From", value=datetime.utcnow().date() - timedelta(days=7), key="audit_from")
+    until = c4.date_input("To", value=datetime.utcnow().date(), key="audit_to")
+    events = audit.query(user_id=users.get(who), action=None if action == "(all)" else action,
+                         since=since.isoformat(), until=(until + timedelta(days=1)).isoformat(), limit=500)
+    if events:
+        st.dataframe(pd.DataFrame(events), use_container_width=True, hide_index=True)
+    else:
+        st.info("No audit events in that range.")
+    st.caption("Writer: " + ", ".join(f"{k} {v:,}" for k, v in audit.stats().items()))
+
+    st.subheader("Schema migrations")
+    applied = db.applied_migrations()
+    if applied:
+        st.dataframe(pd.DataFrame(applied), use_container_width=True)
+    pending = db.pending_migrations()
+    if pending:
+        st.warning("Pending: " + ", ".join(f"{v} ({n})" for v, n in pending))
+
 def account_ui():
     st.title("🔑 Account Settings")
     if not st.session_state.user:
@@ -475,32 +827,37 @@ def login_ui():
 if st.session_state.user is None:
     login_ui()
     st.stop()
+# Attribute this rerun's audit events (county/campaign edits, ingests, scoring) to the user.
+audit.current_user.set(st.session_state.user["id"])
 
 # --------------------------------------------------------------------------------------
 # Router
 # --------------------------------------------------------------------------------------
 sidebar_nav()
 
+PAGES = {
+    "dashboard": dashboard_ui,
+    "campaigns": campaigns_ui,
+    "active": active_recruitment_ui,
+    "candidates_upload": candidates_upload_ui,
+    "imports": imports_ui,
+    "scoring": scoring_ui,
+    "counties": counties_ui,
+    "compliance": compliance_ui,
+    "changelog": changelog_ui,
+    "admin": admin_ui,
+    "account": account_ui,
+}
+
 page = st.session_state.nav
-if page == "dashboard":
-    dashboard_ui()
-elif page == "campaigns":
-    campaigns_ui()
-elif page == "active":
-    active_recruitment_ui()
-elif page == "candidates_upload":
-    candidates_upload_ui()
-elif page == "imports":
-    imports_ui()
-elif page == "scoring":
-    scoring_ui()
-elif page == "counties":
-    counties_ui()
-elif page == "compliance":
-    compliance_ui()
-elif page == "changelog":
-    changelog_ui()
-elif page == "admin":
-    admin_ui()
-elif page == "account":
-    account_ui()
+_page_start = perf_counter()
+_overhead_ms = (_page_start - _RERUN_START) * 1000
+if page in PAGES:
+    with instrumentation.timed("page", page):
+        PAGES[page]()
+# Shown on the next Admin render: script overhead before the page, and the page itself.
+st.session_state.rerun_timings = {
+    "imports": _IMPORTS_MS,
+    "overhead_before_page": _overhead_ms,
+    f"page {page}": (perf_counter() - _page_start) * 1000,
+}
@@ -0,0 +1,180 @@
+# Buffered audit log.
+#
+# record() only queues the event; a background thread writes queued events to audit_logs
+# in batches (one transaction each), and flush() runs at interpreter exit so nothing queued
+# is lost on a clean shutdown. A batch that fails to write (e.g. the database stayed locked
+# past busy_timeout) is kept and retried first, with the writer backing off. The queue is
+# bounded: when it's full the caller flushes inline, and an event is dropped (counted in
+# stats()) only if there is still no room; record() never raises. The acting user comes from the
+# `current_user` context variable unless passed explicitly; background jobs record with no user.
+import atexit
+import contextvars
+import json
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 1.0    # seconds an event may wait before it's written
+MAX_BACKOFF = 30.0      # longest wait between retries of a failed batch
+
+current_user = contextvars.ContextVar("audit_user", default=None)
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_retry = deque()        # events of the last failed batch, written before anything newer
+_wake = threading.Event()
+_flush_lock = threading.Lock()
+_writer = None
+_writer_lock = threading.Lock()
+_stats = {"recorded": 0, "written": 0, "inline_flushes": 0, "errors": 0, "dropped": 0}
+
+@contextmanager
+def as_user(user_id):
+    """Attribute events recorded inside the block to user_id."""
+    token = current_user.set(user_id)
+    try:
+        yield
+    finally:
+        current_user.reset(token)
+
+def record(action: str, user_id=None, **details):
+    """Queue an audit event; details must be JSON-serialisable (other values are str()-ed)."""
+    event = (user_id if user_id is not None else current_user.get(), action,
+             json.dumps(details, default=str) if details else None, datetime.utcnow().isoformat())
+    _start_writer()
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        _stats["inline_flushes"] += 1
+        try:
+            flush()
+        except Exception:
+            pass  # the failed batch moved to the retry buffer, which still frees queue space
+        try:
+            _queue.put_nowait(event)
+        except queue.Full:
+            _stats["dropped"] += 1
+            return
+    _stats["recorded"] += 1
+    if _queue.qsize() >= BATCH_SIZE:
+        _wake.set()
+
+def _drain(limit):
+    events = []
+    while len(events) < limit:
+        try:
+            events.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return events
+
+def flush() -> int:
+    """Write everything queued so far; returns events written.
+
+    Raises if a batch can't be written; that batch stays queued for the next flush.
+    """
+    import db  # db imports this module for its own write helpers
+    written = 0
+    with _flush_lock:
+        while True:
+            if _retry:
+                events = list(_retry)
+                _retry.clear()
+            else:
+                events = _drain(BATCH_SIZE)
+            if not events:
+                return written
+            try:
+                with db.transaction() as conn:
+                    conn.executemany("INSERT INTO audit_logs (user_id, action, details, created_at) "
+                                     "VALUES (?, ?, ?, ?)", events)
+            except Exception:
+                _stats["errors"] += 1
+                _retry.extend(events)
+                raise
+            written += len(events)
+            _stats["written"] += len(events)
+
+def _loop():
+    delay = FLUSH_INTERVAL
+    while True:
+        _wake.wait(delay)
+        _wake.clear()
+        try:
+            flush()
+            delay = FLUSH_INTERVAL
+        except Exception:
+            delay = min(delay * 2, MAX_BACKOFF)  # counted in stats; the batch is retried first
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_loop, name="audit-writer", daemon=True)
+            _writer.start()
+
+def _flush_at_exit(attempts: int = 3):
+    for i in range(attempts):
+        try:
+            flush()
+            return
+        except Exception:
+            time.sleep(0.5 * (i + 1))
+
+atexit.register(_flush_at_exit)
+
+def stats() -> dict:
+    return {**_stats, "queued": _queue.qsize() + len(_retry)}
+
+# --- Queries ---
+def query(user_id=None, action=None, since=None, until=None, limit: int = 200, before_id=None):
+    """Newest-first events filtered by user, action and ISO time range [since, until).
+
+    Pending events are flushed first. Each filter is served by an index on
+    (user_id, created_at), (action, created_at) or created_at. Pass the last row's id as
+    before_id for the next page.
+    """
+    import db
+    try:
+        flush()
+    except Exception:
+        pass  # show what's written; the writer retries the rest
+    where, params = [], []
+    if user_id is not None:
+        where.append("a.user_id = ?")
+        params.append(int(user_id))
+    if action:
+        where.append("a.action = ?")
+        params.append(action)
+    if since:
+        where.append("a.created_at >= ?")
+        params.append(str(since))
+    if until:
+        where.append("a.created_at < ?")
+        params.append(str(until))
+    if before_id is not None:
+        where.append("a.id < ?")
+        params.append(int(before_id))
+    sql = """
+        SELECT a.id, a.created_at, a.user_id, u.email AS user_email, a.action, a.details
+        FROM audit_logs a LEFT JOIN users u ON u.id = a.user_id
+    """
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY a.created_at DESC, a.id DESC LIMIT ?"
+    params.append(int(limit))
+    with db.connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [{**dict(r), "details": json.loads(r["details"]) if r["details"] else {}} for r in rows]
+
+def actions():
+    """Distinct recorded actions, for filters."""
+    import db
+    with db.connection() as conn:
+        return [r[0] for r in conn.execute("SELECT DISTINCT action FROM audit_logs ORDER BY action")]
@@ -0,0 +1 @@
+# Benchmarks for ingestion, scoring and queries; run with `python -m benchmarks.run --help`.
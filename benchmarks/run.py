@@ -0,0 +1,220 @@
+# Benchmark runner: builds a synthetic database in a temp dir and times the hot paths.
+#
+#   python -m benchmarks.run --size 100k --out bench.json
+#   python -m benchmarks.run --size 100k --compare bench.json     # exit 1 on regressions
+#
+# Every result carries median/min/p95 in milliseconds; --compare matches results by name
+# and flags any whose median grew by more than --tolerance (and by at least --min-delta ms,
+# so sub-millisecond query jitter doesn't fail a run).
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks import synthetic
+
+def _summary(samples, **extra):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))]
+    out = {"median_ms": statistics.median(samples), "min_ms": samples[0], "p95_ms": p95, "runs": len(samples)}
+    out.update(extra)
+    return out
+
+def timed(fn, repeat: int = 7, warmup: int = 1, **extra):
+    """Call fn() warmup + repeat times; summary of the timed calls in ms."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    return _summary(samples, **extra)
+
+def once(fn, rows: int = None):
+    """Time a single call (ingest-style work that can't be repeated on the same data)."""
+    t = time.perf_counter()
+    result = fn()
+    ms = (time.perf_counter() - t) * 1000
+    extra = {}
+    if rows:
+        extra = {"rows": rows, "rows_per_s": round(rows / (ms / 1000), 1) if ms else None}
+    return result, _summary([ms], **extra)
+
+def run(size: str, seed: int = 1, sample: int = 2000, workdir: str = None, log=print):
+    n = synthetic.SIZES[size]
+    # Imported here so `--help` does not pay for pandas/rapidfuzz.
+    import db
+    import auth
+    import ingestion
+    import scoring
+    import export
+    import dnc
+
+    db.configure(db_file=os.path.join(workdir, "bench.db"))
+    db.ensure_initialized()
+    auth.ensure_seed_admin()
+    for kw in scoring.DEFAULT_KEYWORDS:
+        scoring.add_new_keyword(kw["term"], kw["tier"], kw.get("notes"))
+    db.add_counties(synthetic.HIRING_COUNTIES)
+    results = {}
+
+    # --- Ingestion ---
+    log(f"ingesting {n:,} applications")
+    chunks = []
+    def ingest_all():
+        for df in synthetic.applications(n, seed=seed):
+            t = time.perf_counter()
+            ingestion.ingest_applications(df)
+            chunks.append((time.perf_counter() - t) * 1000)
+    ingest_all()
+    total = sum(chunks)
+    results["ingest.applications"] = _summary([total], rows=n, rows_per_s=round(n / (total / 1000), 1))
+
+    tg = synthetic.testgorilla(n)
+    _, results["ingest.testgorilla"] = once(lambda: ingestion.ingest_testgorilla(tg), rows=len(tg))
+    notes = synthetic.interview_notes(n)
+    _, results["ingest.interview_notes"] = once(lambda: ingestion.ingest_interview_notes(notes), rows=len(notes))
+
+    csv_rows = min(n, 10_000)
+    csv_path = os.path.join(workdir, "applications.csv")
+    next(synthetic.applications(csv_rows, seed=seed + 100, chunk=csv_rows)).to_csv(csv_path, index=False)
+    _, results["ingest.csv_stream"] = once(
+        lambda: ingestion.ingest_csv_stream(csv_path, "applications", is_test=True, chunksize=2000), rows=csv_rows)
+
+    _, results["dnc.reevaluate"] = once(dnc.reevaluate, rows=n)
+
+    camps = synthetic.campaigns()
+    _, results["campaigns.add_campaigns"] = once(
+        lambda: db.add_campaigns(list(camps.itertuples(index=False, name=None))), rows=len(camps))
+
+    # --- Scoring ---
+    log("scoring")
+    rng = random.Random(seed)
+    ids = rng.sample(range(1, n + 1), min(sample, n))
+    texts = db.get_resume_texts(ids)
+    sample_texts = [texts[i] or "" for i in ids]
+    per_call = sample_texts[:200]
+    results["scoring.score_text"] = timed(lambda: [scoring.score_text(t) for t in per_call], repeat=3,
+                                          texts=len(per_call))
+    results["scoring.score_text"]["per_text_ms"] = results["scoring.score_text"]["median_ms"] / len(per_call)
+    results["scoring.score_batch"] = timed(lambda: scoring.score_batch(sample_texts), repeat=3, texts=len(sample_texts))
+    _, results["scoring.score_candidates.cold"] = once(lambda: scoring.score_candidates(ids), rows=len(ids))
+    results["scoring.score_candidates.warm"] = timed(lambda: scoring.score_candidates(ids), repeat=3, rows=len(ids))
+    results["scoring.rethreshold"] = timed(lambda: scoring.score_candidates(ids, threshold=75), repeat=1, warmup=0,
+                                           rows=len(ids))
+    campaign_id = db.list_campaigns()[0]["id"]
+    results["scoring.rank_campaign"] = timed(lambda: scoring.rank_candidates_for_campaign(campaign_id, k=10))
+
+    # --- Queries ---
+    log("queries")
+    since = (date.today() - timedelta(days=90)).isoformat()
+    today = date.today().isoformat()
+    mid = n // 2
+    results["db.stats_totals"] = timed(db.stats_totals, repeat=21)
+    results["db.stats_by_day"] = timed(lambda: db.stats_by_day("candidates", since=since), repeat=21)
+    results["db.stats_by_source"] = timed(lambda: db.stats_by_source("candidates"), repeat=21)
+    results["db.list_candidates_page.first"] = timed(lambda: db.list_candidates_page(limit=50), repeat=21)
+    results["db.list_candidates_page.deep"] = timed(lambda: db.list_candidates_page(after_id=mid, limit=50), repeat=21)
+    results["db.list_candidates_page.source"] = timed(
+        lambda: db.list_candidates_page(limit=50, source=synthetic.SOURCES[0]), repeat=21)
+    results["db.list_candidates_page.dates"] = timed(
+        lambda: db.list_candidates_page(limit=50, date_from=since, date_to=today), repeat=21)
+    results["db.list_candidates_page.email_prefix"] = timed(
+        lambda: db.list_candidates_page(limit=50, email_prefix="candidate12"), repeat=21)
+    results["db.search_candidates"] = timed(lambda: db.search_candidates("zendesk", limit=20), repeat=21)
+    results["db.find_candidate_by_email"] = timed(lambda: db.find_candidate_by_email(synthetic.email(mid)), repeat=21)
+    results["db.list_campaigns.cached"] = timed(db.list_campaigns, repeat=21)
+    def uncached():
+        db.invalidate_cache("campaigns")
+        db.list_campaigns()
+    results["db.list_campaigns.uncached"] = timed(uncached, repeat=21)
+    results["db.campaigns_with_keyword"] = timed(lambda: db.campaigns_with_keyword("Zendesk"), repeat=21)
+
+    # --- Export ---
+    log("export")
+    _, results["export.csv"] = once(lambda: export.export_candidates(os.path.join(workdir, "export.csv")), rows=n)
+
+    # --- Auth ---
+    results["auth.login.ok"] = timed(lambda: auth.login("admin@pulsehire.local", "admin123"), repeat=21)
+    results["auth.login.bad"] = timed(lambda: auth.login("admin@pulsehire.local", "wrong"), repeat=21)
+
+    return {
+        "meta": {
+            "size": size,
+            "candidates": n,
+            "seed": seed,
+            "sample": len(ids),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "when": datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.10, min_delta_ms: float = 0.5):
+    """[(name, base_ms, now_ms, ratio, status)] for results present in both runs."""
+    rows = []
+    for name, now in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or not base.get("median_ms"):
+            continue
+        ratio = now["median_ms"] / base["median_ms"]
+        if abs(now["median_ms"] - base["median_ms"]) < min_delta_ms:
+            status = "same"
+        else:
+            status = "slower" if ratio > 1 + tolerance else "faster" if ratio < 1 - tolerance else "same"
+        rows.append((name, base["median_ms"], now["median_ms"], ratio, status))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run", description="PulseHire benchmarks")
+    ap.add_argument("--size", choices=sorted(synthetic.SIZES, key=synthetic.SIZES.get), default="1k")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--sample", type=int, default=2000, help="candidates used by the scoring benchmarks")
+    ap.add_argument("--out", help="write results JSON here (default: stdout)")
+    ap.add_argument("--compare", metavar="BASELINE", help="compare against a saved results JSON")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="relative change treated as noise")
+    ap.add_argument("--min-delta", type=float, default=0.5, help="absolute change in ms treated as noise")
+    ap.add_argument("--keep", metavar="DIR", help="build the database in DIR and keep it")
+    args = ap.parse_args(argv)
+
+    log = lambda msg: print(msg, file=sys.stderr)
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        report = run(args.size, args.seed, args.sample, args.keep, log=log)
+    else:
+        with tempfile.TemporaryDirectory(prefix="pulsehire-bench-") as tmp:
+            report = run(args.size, args.seed, args.sample, tmp, log=log)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("size") != args.size:
+            log(f"warning: baseline size {baseline.get('meta', {}).get('size')} != {args.size}")
+        rows = compare(report, baseline, args.tolerance, args.min_delta)
+        width = max((len(r[0]) for r in rows), default=10)
+        for name, base, now, ratio, status in rows:
+            log(f"{name:<{width}}  {base:10.2f} ms -> {now:10.2f} ms  x{ratio:5.2f}  {status}")
+        if any(r[4] == "slower" for r in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+# Deterministic synthetic datasets shaped like real PulseHire uploads.
+import random
+from datetime import date, timedelta
+import pandas as pd
+
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+FIRST = ["Aoife", "Sean", "Niamh", "Conor", "Ciara", "Darragh", "Saoirse", "Cian", "Emma", "Jack",
+         "Orla", "Liam", "Grace", "Oisin", "Roisin", "Eoin", "Sinead", "Padraig", "Mary", "John"]
+LAST = ["Murphy", "Kelly", "O'Sullivan", "Walsh", "Smith", "O'Brien", "Byrne", "Ryan", "O'Connor",
+        "O'Neill", "Reilly", "Doyle", "McCarthy", "Gallagher", "Doherty", "Kennedy", "Lynch", "Quinn"]
+SOURCES = ["Indeed", "LinkedIn", "Referral", "Website", "Jobs.ie", "Agency"]
+FILLER = ("worked team shift calls customers handled queries daily weekly managed resolved escalated "
+          "trained new staff reports targets exceeded quality scores contact centre retail hospitality "
+          "warehouse inbound outbound sales service tickets email chat phone systems process improved "
+          "responsible for supporting delivering ensuring accurate records data entry schedules").split()
+SKILLS = ["Customer Service", "Customer Support", "Communication Skills", "CRM Software", "Zendesk",
+          "Salesforce", "Data Entry", "Problem Solving", "Team Player", "Call Centre", "Microsoft Excel",
+          "Conflict Resolution", "Time Management", "Telesales", "Complaint Handling", "Forklift Licence"]
+ROLES = ["Customer Service Agent", "Telehealth Nurse", "Sales Advisor", "Technical Support",
+         "Collections Agent", "Team Leader", "Back Office Administrator", "Retention Specialist"]
+# Hiring areas for the run, and application locations in the spellings people actually type.
+HIRING_COUNTIES = ["Dublin", "Kildare", "Meath", "Wicklow", "Cork"]
+LOCATIONS = ["Dublin", "Co. Dublin", "Dublin 15", "D08", "Baile Átha Cliath", "Naas, Co. Kildare", "Kildare",
+             "Navan, Co Meath", "Bray, Wicklow", "Cork", "Cork City", "Corcaigh", "Galway", "Co. Galway",
+             "Limerick", "Limrick", "Waterford", "Sligo", "Donegal", "Kerry", "Tipp", "Wexford", "Kilkeny",
+             "London, UK", "", None]
+INTERVIEW = ["Strong communicator, good rapport.", "Needs coaching on product knowledge.",
+             "Available immediately, prefers evenings.", "Excellent CRM experience.",
+             "Nervous at start, improved.", "Would suit outbound sales.", "Not a fit for shift pattern."]
+
+def resume(rng: random.Random, words: int = 120) -> str:
+    """Filler prose with a handful of skills, some lower-cased or slightly misspelt."""
+    out = rng.choices(FILLER, k=words)
+    for skill in rng.sample(SKILLS, rng.randint(1, 6)):
+        if rng.random() < 0.3:
+            skill = skill.lower()
+        if rng.random() < 0.15 and len(skill) > 6:
+            i = rng.randrange(1, len(skill) - 1)
+            skill = skill[:i] + skill[i + 1:]
+        out.insert(rng.randrange(len(out)), skill)
+    return " ".join(out)
+
+def email(i: int) -> str:
+    return f"candidate{i}@example.com"
+
+def applications(n: int, seed: int = 1, chunk: int = 50_000, words: int = 120):
+    """Yield application DataFrames (name, email, phone, source, resume_text, notes, county) of up to `chunk` rows."""
+    rng = random.Random(seed)
+    for start in range(0, n, chunk):
+        rows = []
+        for i in range(start, min(n, start + chunk)):
+            rows.append({
+                "name": f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                "email": email(i),
+                "phone": f"08{rng.randint(3, 9)} {rng.randint(1000000, 9999999)}",
+                "source": rng.choice(SOURCES),
+                "resume_text": resume(rng, words),
+                "notes": rng.choice(["", "Applied via mobile", "Returning applicant", None]),
+                "county": rng.choice(LOCATIONS),
+            })
+        yield pd.DataFrame(rows)
+
+def testgorilla(n_candidates: int, share: float = 0.6, seed: int = 2) -> pd.DataFrame:
+    """TestGorilla export for a share of the candidates, with mixed-case emails like real exports."""
+    rng = random.Random(seed)
+    picks = rng.sample(range(n_candidates), int(n_candidates * share))
+    return pd.DataFrame({
+        "Email": [email(i).upper() if rng.random() < 0.1 else email(i) for i in picks],
+        "Score": [round(rng.uniform(20, 100), 1) for _ in picks],
+    })
+
+def interview_notes(n_candidates: int, share: float = 0.2, seed: int = 3) -> pd.DataFrame:
+    rng = random.Random(seed)
+    picks = rng.sample(range(n_candidates), int(n_candidates * share))
+    start = date.today() - timedelta(days=365)
+    return pd.DataFrame({
+        "email": [email(i) for i in picks],
+        "notes": [rng.choice(INTERVIEW) for _ in picks],
+        "date": [(start + timedelta(days=rng.randrange(365))).isoformat() for _ in picks],
+    })
+
+def campaigns(n: int = 50, seed: int = 4) -> pd.DataFrame:
+    """Rows shaped like assets/campaigns_template.csv (name, hours, keywords, notes)."""
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "name": [f"{rng.choice(ROLES)} {i + 1}" for i in range(n)],
+        "hours": [rng.choice(["Mon-Fri 09:00-17:00", "Mon-Sun 08:00-20:00", "Sat-Sun 10:00-18:00"]) for _ in range(n)],
+        "keywords": ["; ".join(rng.sample(SKILLS, rng.randint(2, 5))) for _ in range(n)],
+        "notes": [rng.choice(["Urgent backfill", "", "Hybrid", "Graduate friendly"]) for _ in range(n)],
+    })
@@ -1,2 +1,81 @@
-# Placeholder module for future changelog features.
+# Change feed over the `changes` table, filled by triggers (db.CHANGE_SOURCES).
+#
+# Sync jobs keep the last seq they processed and call changes_since(cursor) until it
+# returns no rows; each call is a primary-key range scan, whatever the size of the
+# source tables. Start a new consumer with a full copy and latest_seq() taken before it.
+from datetime import datetime, timedelta
 
+import db
+
+TABLES = tuple(db.CHANGE_SOURCES)
+COLUMNS = "seq, table_name, row_id, op, summary, changed_at"
+
+def latest_seq() -> int:
+    """Highest seq handed out so far (kept by AUTOINCREMENT, so still right after a prune)."""
+    with db.connection() as conn:
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'changes'").fetchone()
+    return row[0] if row else 0
+
+def _table_filter(tables, params):
+    tables = [t for t in (tables or ()) if t in TABLES]
+    if not tables:
+        return ""
+    params.extend(tables)
+    return f" AND table_name IN ({','.join('?' * len(tables))})"
+
+def changes_since(cursor: int = 0, limit: int = 500, tables=None):
+    """Changes with seq > cursor in seq order; returns (rows, next_cursor).
+
+    next_cursor is the last row's seq (or `cursor` when nothing is new); pass it back
+    to continue. `tables` restricts the feed to some of TABLES.
+    """
+    params = [int(cursor)]
+    sql = f"SELECT {COLUMNS} FROM changes WHERE seq > ?" + _table_filter(tables, params)
+    params.append(int(limit))
+    with db.connection() as conn:
+        rows = [dict(r) for r in conn.execute(sql + " ORDER BY seq LIMIT ?", params)]
+    return rows, (rows[-1]["seq"] if rows else int(cursor))
+
+def recent_changes(before_seq: int = None, limit: int = 100, tables=None):
+    """Newest-first page for the Changelog page; pass the last row's seq as before_seq for older ones."""
+    params = []
+    sql = f"SELECT {COLUMNS} FROM changes WHERE 1=1"
+    if before_seq is not None:
+        sql += " AND seq < ?"
+        params.append(int(before_seq))
+    sql += _table_filter(tables, params)
+    params.append(int(limit))
+    with db.connection() as conn:
+        return [dict(r) for r in conn.execute(sql + " ORDER BY seq DESC LIMIT ?", params)]
+
+def row_history(table: str, row_id: int):
+    """Every recorded change to one row, oldest first."""
+    with db.connection() as conn:
+        return [dict(r) for r in conn.execute(
+            f"SELECT {COLUMNS} FROM changes WHERE table_name = ? AND row_id = ? ORDER BY seq", (table, int(row_id)))]
+
+def scrub_candidates(conn, candidate_ids):
+    """Blank the summaries (names) recorded for these candidates; run in the purge transaction."""
+    ids = list(candidate_ids)
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        conn.execute(f"UPDATE changes SET summary = NULL WHERE table_name = 'candidates' "
+                     f"AND row_id IN ({','.join('?' * len(chunk))})", chunk)
+
+def prune(older_than_days: int, batch_size: int = 5000) -> int:
+    """Delete changes older than the given age, oldest first in seq order; returns rows deleted.
+
+    changed_at grows with seq, so this walks the primary key from the start and stops at the
+    first newer row instead of scanning the table.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=int(older_than_days))).isoformat()
+    deleted = 0
+    while True:
+        with db.transaction() as conn:
+            rows = conn.execute("SELECT seq, changed_at FROM changes ORDER BY seq LIMIT ?", (int(batch_size),)).fetchall()
+            old = [r["seq"] for r in rows if r["changed_at"] < cutoff]
+            if old:
+                conn.execute("DELETE FROM changes WHERE seq <= ?", (old[-1],))
+        deleted += len(old)
+        if len(old) < len(rows) or not rows:
+            return deleted
@@ -1,2 +1,179 @@
-# Placeholder module for future compliance features.
+# Retention: candidates older than RETENTION_DAYS are deleted with everything that hangs off them.
+#
+# Purges run in small batches, each in its own short transaction found through the
+# created_at index, with a pause between batches so recruiters' writes get the lock in
+# between. A run can stop anywhere (time/batch budget, crash) and the next one simply
+# continues: whatever is still older than the cutoff is what's left to do. Every batch is
+# written to audit_logs in the same transaction as its deletes. Purged candidates' names are
+# blanked in the change log, and change-log rows past the retention period go at the end of a run.
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
 
+import changelog
+import db
+
+RETENTION_DAYS = 730
+BATCH_SIZE = 200            # ~50-80 ms of write lock per batch on a 100k-candidate DB
+PAUSE_SECONDS = 0.05
+RUN_EVERY_DAYS = 7
+
+# Rows keyed by candidate_id, deleted explicitly before their candidates (indexed on candidate_id).
+DEPENDENTS = ("attachments", "test_scores", "interviews", "candidate_scores", "candidate_matches", "keyword_matches")
+
+_run_lock = threading.RLock()  # one purge at a time per process
+_scheduler = None
+
+def cutoff_for(retention_days: int = RETENTION_DAYS, now: datetime = None) -> str:
+    return ((now or datetime.utcnow()) - timedelta(days=int(retention_days))).isoformat()
+
+def expired_counts(retention_days: int = RETENTION_DAYS) -> dict:
+    """Dry run: how many candidates and dependent rows a purge would delete right now."""
+    cutoff = cutoff_for(retention_days)
+    expired = "SELECT id FROM candidates WHERE created_at < ?"
+    with db.connection() as conn:
+        out = {"cutoff": cutoff,
+               "candidates": conn.execute(f"SELECT COUNT(*) FROM ({expired})", (cutoff,)).fetchone()[0]}
+        for table in DEPENDENTS:
+            out[table] = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE candidate_id IN ({expired})",
+                                      (cutoff,)).fetchone()[0]
+    return out
+
+def _repoint_duplicates(conn, ids, marks):
+    """Kept duplicates of purged masters: the oldest becomes the master, the rest link to it."""
+    rows = conn.execute(f"""
+        SELECT id, duplicate_of FROM candidates
+        WHERE duplicate_of IN ({marks}) AND id NOT IN ({marks}) ORDER BY id
+    """, ids + ids).fetchall()
+    new_master, links = {}, []
+    for r in rows:
+        m = new_master.setdefault(r["duplicate_of"], r["id"])
+        links.append((None if m == r["id"] else m, r["id"]))
+    conn.executemany("UPDATE candidates SET duplicate_of = ? WHERE id = ?", links)
+
+def _purge_batch(conn, cutoff, batch_size, user_id, run_id):
+    ids = [r[0] for r in conn.execute(
+        "SELECT id FROM candidates WHERE created_at < ? ORDER BY created_at, id LIMIT ?",
+        (cutoff, int(batch_size)))]
+    if not ids:
+        return None, []
+    marks = ",".join("?" * len(ids))
+    paths = [r[0] for r in conn.execute(
+        f"SELECT path FROM attachments WHERE candidate_id IN ({marks}) AND path IS NOT NULL", ids)]
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'candidate_search'").fetchone():
+        # Drop the search rows first so the per-interview delete triggers have nothing to rebuild.
+        conn.execute(f"DELETE FROM candidate_search WHERE rowid IN ({marks})", ids)
+    counts = {}
+    for table in DEPENDENTS:
+        counts[table] = conn.execute(f"DELETE FROM {table} WHERE candidate_id IN ({marks})", ids).rowcount
+    _repoint_duplicates(conn, ids, marks)
+    counts["candidates"] = conn.execute(f"DELETE FROM candidates WHERE id IN ({marks})", ids).rowcount
+    changelog.scrub_candidates(conn, ids)
+    conn.execute("INSERT INTO audit_logs (user_id, action, details, created_at) VALUES (?, ?, ?, ?)",
+                 (user_id, "retention_purge_batch",
+                  json.dumps({"run": run_id, "cutoff": cutoff, "first_id": min(ids), "last_id": max(ids), **counts}),
+                  datetime.utcnow().isoformat()))
+    return counts, paths
+
+def purge_expired(retention_days: int = RETENTION_DAYS, batch_size: int = BATCH_SIZE, dry_run: bool = False,
+                  max_batches: int = None, max_seconds: float = None, pause: float = PAUSE_SECONDS,
+                  progress=None, user_id=None) -> dict:
+    """Delete candidates created before the retention cutoff, with their dependents, in batches.
+
+    dry_run returns expired_counts() without deleting. max_batches/max_seconds bound one
+    run (e.g. during business hours); `done` in the result says whether anything expired is
+    left. `progress`, if given, is called with the running totals after each batch.
+    """
+    if dry_run:
+        return {**expired_counts(retention_days), "dry_run": True}
+    if not _run_lock.acquire(blocking=False):
+        raise RuntimeError("A retention purge is already running.")
+    try:
+        return _purge(retention_days, batch_size, max_batches, max_seconds, pause, progress, user_id)
+    finally:
+        _run_lock.release()
+
+def _purge(retention_days, batch_size, max_batches, max_seconds, pause, progress, user_id):
+    cutoff = cutoff_for(retention_days)
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    totals = {"cutoff": cutoff, "run": run_id, "batches": 0, "candidates": 0, **{t: 0 for t in DEPENDENTS}}
+    started = time.monotonic()
+    done = False
+    while True:
+        if max_batches is not None and totals["batches"] >= max_batches:
+            break
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            break
+        with db.transaction() as conn:
+            counts, paths = _purge_batch(conn, cutoff, batch_size, user_id, run_id)
+        if counts is None:
+            done = True
+            break
+        for path in paths:
+            # Files go only after their rows are committed; a missing file is not an error.
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        totals["batches"] += 1
+        for k, v in counts.items():
+            totals[k] += v
+        if progress:
+            progress(dict(totals))
+        if pause:
+            time.sleep(pause)
+    totals["done"] = done
+    if done:
+        totals["changes_pruned"] = changelog.prune(retention_days)
+    totals["seconds"] = round(time.monotonic() - started, 2)
+    with db.connection() as conn:
+        conn.execute("INSERT INTO audit_logs (user_id, action, details, created_at) VALUES (?, ?, ?, ?)",
+                     (user_id, "retention_run", json.dumps(totals), datetime.utcnow().isoformat()))
+    return totals
+
+# --- Weekly schedule ---
+def last_run():
+    """The most recent completed-or-stopped purge run: {created_at, user_id, **totals}, or None."""
+    with db.connection() as conn:
+        row = conn.execute("SELECT user_id, details, created_at FROM audit_logs WHERE action = 'retention_run' "
+                           "ORDER BY id DESC LIMIT 1").fetchone()
+    if row is None:
+        return None
+    return {"created_at": row["created_at"], "user_id": row["user_id"], **json.loads(row["details"] or "{}")}
+
+def run_if_due(every_days: int = RUN_EVERY_DAYS, **kwargs):
+    """Purge if the last finished run is older than every_days (or an earlier run stopped early)."""
+    if not _run_lock.acquire(blocking=False):
+        return None  # a purge is already running in this process
+    try:
+        last = last_run()
+        if last and last.get("done") and last["created_at"] >= cutoff_for(every_days):
+            return None
+        return purge_expired(**kwargs)
+    finally:
+        _run_lock.release()
+
+def autorun_enabled() -> bool:
+    """Weekly purges are opt-in: PULSEHIRE_RETENTION_AUTORUN=1, after a manual run has been checked."""
+    return os.environ.get("PULSEHIRE_RETENTION_AUTORUN", "0") == "1"
+
+def start_scheduler(check_every_seconds: int = 3600):
+    """Start (once per process) a daemon thread that runs run_if_due() every check_every_seconds.
+
+    Does nothing unless autorun_enabled(); deleting data is never the default.
+    """
+    global _scheduler
+    if not autorun_enabled() or _scheduler is not None:
+        return _scheduler
+    def loop():
+        while True:
+            try:
+                run_if_due()
+            except Exception:
+                pass  # the next check retries; batches already committed stay committed
+            time.sleep(check_every_seconds)
+    _scheduler = threading.Thread(target=loop, name="retention-purge", daemon=True)
+    _scheduler.start()
+    return _scheduler
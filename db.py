@@ -1,221 +1,1438 @@
 import os
+import re
+import json
+import queue
 import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
 from datetime import datetime
+import instrumentation
+import audit
 
 DB_FILE = "pulsehire.db"
 
 # --- Connections ---
+# Applied to every connection the pool opens; change them through configure().
+PRAGMAS = {
+    "journal_mode": "WAL",      # readers keep going while an ingest writes
+    "synchronous": "NORMAL",    # safe with WAL, one fsync per checkpoint instead of per commit
+    "foreign_keys": "ON",
+    "busy_timeout": 5000,       # ms to wait on a locked database before raising
+    "cache_size": -16000,       # KiB of page cache per connection
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+POOL_SIZE = 8
+
+_pool = queue.LifoQueue()
+_pool_epoch = 0                 # bumped by configure(); stale connections are closed on return
+_local = threading.local()      # the connection of this thread's open transaction, if any
+
+def configure(db_file=None, pragmas=None, pool_size=None):
+    """Point the pool at another database file and/or override pragmas; drops idle connections."""
+    global DB_FILE, POOL_SIZE, _pool_epoch
+    if db_file is not None:
+        DB_FILE = db_file
+    if pragmas:
+        PRAGMAS.update(pragmas)
+    if pool_size is not None:
+        POOL_SIZE = int(pool_size)
+    _pool_epoch += 1
+    invalidate_cache()
+    while True:
+        try:
+            _pool.get_nowait()[1].close()
+        except queue.Empty:
+            break
+
+def _open():
+    # Autocommit mode: single statements commit on their own, transaction() groups the rest.
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False, isolation_level=None, cached_statements=256,
+                           factory=instrumentation.connection_factory())
+    conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS.items():
+        conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
 def get_conn():
-    return sqlite3.connect(DB_FILE, check_same_thread=False)
+    """A new tuned connection that the caller must close; prefer connection()/transaction()."""
+    return _open()
 
 # Back-compat alias for ingestion.py
 def get_connection():
     return get_conn()
 
+@contextmanager
+def connection():
+    """Borrow a pooled connection; it is returned (not closed) afterwards.
+
+    Pooled connections keep their prepared-statement cache between calls. Inside a
+    transaction() on the same thread this yields that transaction's connection.
+    """
+    current = getattr(_local, "conn", None)
+    if current is not None:
+        yield current
+        return
+    try:
+        epoch, conn = _pool.get_nowait()
+        if epoch != _pool_epoch:
+            conn.close()
+            epoch, conn = _pool_epoch, _open()
+    except queue.Empty:
+        epoch, conn = _pool_epoch, _open()
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        if epoch == _pool_epoch and _pool.qsize() < POOL_SIZE:
+            _pool.put_nowait((epoch, conn))
+        else:
+            conn.close()
+
+@contextmanager
+def transaction():
+    """Yield a connection inside BEGIN IMMEDIATE ... COMMIT (rolled back on error).
+
+    Nested calls on the same thread join the outer transaction.
+    """
+    if getattr(_local, "conn", None) is not None:
+        yield _local.conn
+        return
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _local.conn = conn
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            _local.conn = None
+
 def _exec(conn, sql, params=()):
     cur = conn.cursor()
     cur.execute(sql, params)
-    conn.commit()
+    if not conn.in_transaction:
+        conn.commit()
     return cur
 
 # --- Schema init ---
 def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+    with transaction() as conn:
+        cur = conn.cursor()
 
-    # Users
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-    """)
+        # Users
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL
+            )
+        """)
 
-    # Keywords (optional, for scoring seed)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS keywords (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            term TEXT UNIQUE NOT NULL,
-            tier INTEGER NOT NULL DEFAULT 2,
-            notes TEXT
-        )
-    """)
+        # Keywords (optional, for scoring seed)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS keywords (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                term TEXT UNIQUE NOT NULL,
+                tier INTEGER NOT NULL DEFAULT 2,
+                notes TEXT
+            )
+        """)
 
-    # Campaigns
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS campaigns (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            hours TEXT,
-            keywords TEXT,
-            notes TEXT,
-            created_at TEXT NOT NULL DEFAULT (datetime('now'))
-        )
+        # Campaigns
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS campaigns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                hours TEXT,
+                keywords TEXT,
+                notes TEXT,
+                created_at TEXT NOT NULL DEFAULT (datetime('now'))
+            )
+        """)
+
+        # Counties
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS counties (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE
+            )
+        """)
+
+        # Candidates (with resume_text/notes/is_test for ingestion/scoring)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS candidates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                email TEXT,
+                phone TEXT,
+                source TEXT,
+                resume_text TEXT,
+                notes TEXT,
+                is_test INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL DEFAULT (datetime('now'))
+            )
+        """)
+
+        # Attachments (path only for simplicity)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS attachments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                candidate_id INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                path TEXT,
+                uploaded_at TEXT NOT NULL DEFAULT (datetime('now')),
+                FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
+            )
+        """)
+
+        # Test scores (includes 'source' + is_test to match ingestion)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS test_scores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                candidate_id INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                score REAL,
+                notes TEXT,
+                recorded_at TEXT NOT NULL DEFAULT (datetime('now')),
+                is_test INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
+            )
+        """)
+
+        # Interviews (notes)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS interviews (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                candidate_id INTEGER NOT NULL,
+                notes TEXT,
+                date TEXT,
+                recorded_at TEXT NOT NULL DEFAULT (datetime('now')),
+                is_test INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
+            )
+        """)
+
+        # Stored keyword scores, reused until the resume or the keyword set changes
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS candidate_scores (
+                candidate_id INTEGER NOT NULL,
+                keyword_version TEXT NOT NULL,
+                threshold REAL NOT NULL,
+                resume_hash TEXT NOT NULL,
+                score REAL NOT NULL,
+                hits TEXT,
+                scored_at TEXT NOT NULL DEFAULT (datetime('now')),
+                PRIMARY KEY (candidate_id, keyword_version, threshold),
+                FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
+            )
+        """)
+
+        # Raw per-keyword similarities (float64 blob in keyword-index order), threshold independent
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS candidate_matches (
+                candidate_id INTEGER PRIMARY KEY,
+                keyword_version TEXT NOT NULL,
+                resume_hash TEXT NOT NULL,
+                matches BLOB NOT NULL,
+                scored_at TEXT NOT NULL DEFAULT (datetime('now')),
+                FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
+            )
+        """)
+
+        # Streaming CSV imports: one row per file, advanced in the same transaction as each chunk
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                is_test INTEGER NOT NULL DEFAULT 0,
+                chunksize INTEGER NOT NULL,
+                chunks_done INTEGER NOT NULL DEFAULT 0,
+                rows_done INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'running',
+                started_at TEXT NOT NULL DEFAULT (datetime('now')),
+                updated_at TEXT
+            )
+        """)
+
+        # Audit logs
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS audit_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER,
+                action TEXT NOT NULL,
+                details TEXT,
+                created_at TEXT NOT NULL DEFAULT (datetime('now'))
+            )
+        """)
+
+        # Applied migrations (see MIGRATIONS)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL DEFAULT (datetime('now'))
+            )
+        """)
+
+    migrate()
+
+_init_lock = threading.Lock()
+_initialized_for = None   # DB_FILE whose schema this process has already ensured
+
+def ensure_initialized():
+    """Run init_db() once per process and database file; later calls are a no-op check."""
+    global _initialized_for
+    if _initialized_for == DB_FILE:
+        return False
+    with _init_lock:
+        if _initialized_for == DB_FILE:
+            return False
+        init_db()
+        _initialized_for = DB_FILE
+    return True
+
+# --- Migrations ---
+def _add_column(conn, table, column, decl):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    cols = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# Dashboard counters. Each fact row bumps a (source, day) detail row and a ('*', '*') total row.
+STATS_SOURCES = {
+    # table: (metric, is_test expr, source expr, day expr) over NEW/OLD
+    "candidates": ("candidates", "{r}.is_test", "coalesce({r}.source, '')", "substr({r}.created_at, 1, 10)"),
+    "campaigns": ("campaigns", "0", "''", "substr({r}.created_at, 1, 10)"),
+    "test_scores": ("assessments", "{r}.is_test", "coalesce({r}.source, '')", "substr({r}.recorded_at, 1, 10)"),
+    "interviews": ("interviews", "{r}.is_test", "''", "substr({r}.recorded_at, 1, 10)"),
+}
+
+def _create_stats(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stats (
+            metric TEXT NOT NULL,
+            is_test INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            day TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, is_test, source, day)
+        ) WITHOUT ROWID
     """)
+    for table, (metric, is_test, source, day) in STATS_SOURCES.items():
+        for event, r, delta in (("INSERT", "NEW", 1), ("DELETE", "OLD", -1)):
+            keys = [f"'{metric}', {is_test}, {source}, {day}", f"'{metric}', {is_test}, '*', '*'"]
+            body = "".join(f"""
+                INSERT INTO stats (metric, is_test, source, day, count) VALUES ({k}, {delta})
+                ON CONFLICT (metric, is_test, source, day) DO UPDATE SET count = count + ({delta});"""
+                for k in keys).format(r=r)
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_stats_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN {body}
+                END
+            """)
+    # Backfill from whatever is already in the fact tables.
+    conn.execute("DELETE FROM stats")
+    for table, (metric, is_test, source, day) in STATS_SOURCES.items():
+        is_test, source, day = (e.format(r=table) for e in (is_test, source, day))
+        conn.execute(f"""
+            INSERT INTO stats (metric, is_test, source, day, count)
+            SELECT '{metric}', {is_test}, {source}, {day}, COUNT(*) FROM {table} GROUP BY 2, 3, 4
+        """)
+        conn.execute(f"""
+            INSERT INTO stats (metric, is_test, source, day, count)
+            SELECT '{metric}', {is_test}, '*', '*', COUNT(*) FROM {table} GROUP BY 2
+        """)
 
-    # Counties
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS counties (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE
+# Change-data capture: every insert/update/delete on these tables appends a row to
+# `changes` with an ever-increasing seq (AUTOINCREMENT never reuses values, even after
+# pruning), so readers keep a cursor and range-scan past it (see changelog.changes_since).
+CHANGE_SOURCES = {
+    # table: (summary expr over NEW/OLD, columns whose updates are recorded)
+    "candidates": ("coalesce({r}.name, '(no name)') || CASE WHEN {r}.duplicate_of IS NULL THEN '' "
+                   "ELSE ' (duplicate of #' || {r}.duplicate_of || ')' END",
+                   ("name", "email", "phone", "source", "resume_text", "notes", "is_test", "duplicate_of")),
+    "campaigns": ("coalesce({r}.name, '')", ("name", "hours", "keywords", "notes")),
+    "keywords": ("{r}.term || ' (tier ' || {r}.tier || ')'", ("term", "tier", "notes")),
+    "counties": ("{r}.name", ("name",)),
+    "test_scores": ("'candidate #' || {r}.candidate_id || ' ' || {r}.source || ' ' || coalesce({r}.score, '-')",
+                    ("candidate_id", "source", "score", "notes")),
+    "interviews": ("'candidate #' || {r}.candidate_id || coalesce(' on ' || {r}.date, '')",
+                   ("candidate_id", "notes", "date")),
+}
+
+def _create_changes(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            summary TEXT,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
         )
     """)
+    # Per-table feeds and "history of this row" are range scans too.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_table ON changes(table_name, seq)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_changes_row ON changes(table_name, row_id)")
+    for table, (summary, watched) in CHANGE_SOURCES.items():
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            _change_trigger(conn, table, event, summary, watched)
 
-    # Candidates (with resume_text/notes/is_test for ingestion/scoring)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS candidates (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT,
-            email TEXT,
-            phone TEXT,
-            source TEXT,
-            resume_text TEXT,
-            notes TEXT,
-            is_test INTEGER NOT NULL DEFAULT 0,
-            created_at TEXT NOT NULL DEFAULT (datetime('now'))
-        )
+def _change_trigger(conn, table, event, summary, watched=()):
+    r = "OLD" if event == "DELETE" else "NEW"
+    when = ""
+    if event == "UPDATE":
+        when = "WHEN " + " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in watched)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_changes_{table}_{event.lower()} AFTER {event} ON {table}
+        {when}
+        BEGIN
+            INSERT INTO changes (table_name, row_id, op, summary)
+            VALUES ('{table}', {r}.id, '{event.lower()}', {summary.format(r=r)});
+        END
     """)
 
-    # Attachments (path only for simplicity)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS attachments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            candidate_id INTEGER NOT NULL,
-            filename TEXT NOT NULL,
-            path TEXT,
-            uploaded_at TEXT NOT NULL DEFAULT (datetime('now')),
-            FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
-        )
+def _has_fts5(conn):
+    return bool(conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+def _create_candidate_search(conn):
+    """FTS5 index over candidate name/resume/notes plus all their interview notes (rowid = candidate id)."""
+    if not _has_fts5(conn):
+        return  # search_candidates falls back to LIKE
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS candidate_search
+        USING fts5(name, resume_text, notes, interview_notes, tokenize='unicode61 remove_diacritics 2')
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_candidates_insert AFTER INSERT ON candidates BEGIN
+            INSERT INTO candidate_search (rowid, name, resume_text, notes, interview_notes)
+            VALUES (NEW.id, NEW.name, NEW.resume_text, NEW.notes, '');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_candidates_update AFTER UPDATE OF name, resume_text, notes ON candidates BEGIN
+            UPDATE candidate_search SET name = NEW.name, resume_text = NEW.resume_text, notes = NEW.notes
+            WHERE rowid = NEW.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_candidates_delete AFTER DELETE ON candidates BEGIN
+            DELETE FROM candidate_search WHERE rowid = OLD.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_interviews_insert AFTER INSERT ON interviews BEGIN
+            UPDATE candidate_search
+            SET interview_notes = trim(coalesce(interview_notes, '') || ' ' || coalesce(NEW.notes, ''))
+            WHERE rowid = NEW.candidate_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_interviews_delete AFTER DELETE ON interviews BEGIN
+            UPDATE candidate_search
+            SET interview_notes = (SELECT coalesce(group_concat(notes, ' '), '') FROM interviews
+                                   WHERE candidate_id = OLD.candidate_id)
+            WHERE rowid = OLD.candidate_id;
+        END
+    """)
+    conn.execute("DELETE FROM candidate_search")
+    conn.execute("""
+        INSERT INTO candidate_search (rowid, name, resume_text, notes, interview_notes)
+        SELECT c.id, c.name, c.resume_text, c.notes,
+               (SELECT coalesce(group_concat(i.notes, ' '), '') FROM interviews i WHERE i.candidate_id = c.id)
+        FROM candidates c
     """)
 
-    # Test scores (includes 'source' + is_test to match ingestion)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS test_scores (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            candidate_id INTEGER NOT NULL,
-            source TEXT NOT NULL,
-            score REAL,
-            notes TEXT,
-            recorded_at TEXT NOT NULL DEFAULT (datetime('now')),
-            is_test INTEGER NOT NULL DEFAULT 0,
-            FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
-        )
+def _search_interview_updates(conn):
+    """Keep interview_notes right when interviews are edited or moved to another candidate (stub promotion)."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'candidate_search'").fetchone() is None:
+        return
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_interviews_update AFTER UPDATE OF candidate_id, notes ON interviews BEGIN
+            UPDATE candidate_search
+            SET interview_notes = (SELECT coalesce(group_concat(notes, ' '), '') FROM interviews
+                                   WHERE candidate_id = OLD.candidate_id)
+            WHERE rowid = OLD.candidate_id;
+            UPDATE candidate_search
+            SET interview_notes = (SELECT coalesce(group_concat(notes, ' '), '') FROM interviews
+                                   WHERE candidate_id = NEW.candidate_id)
+            WHERE rowid = NEW.candidate_id AND NEW.candidate_id IS NOT OLD.candidate_id;
+        END
     """)
+    # Rows already moved by earlier promotions.
+    conn.execute("""
+        UPDATE candidate_search
+        SET interview_notes = (SELECT coalesce(group_concat(i.notes, ' '), '') FROM interviews i
+                               WHERE i.candidate_id = candidate_search.rowid)
+        WHERE rowid IN (SELECT candidate_id FROM interviews) OR interview_notes != ''
+    """)
+
+# Identity keys used to block candidates for de-duplication (see ingestion.link_duplicates).
+def normalize_email(email):
+    """Lowercased, stripped email; blanks become None."""
+    email = (email or "").strip().lower()
+    return email or None
+
+def phone_digits(phone):
+    """Digits of a phone number in national form (+353 / 00353 -> 0); None if under 7 digits."""
+    d = re.sub(r"\D", "", str(phone or ""))
+    for prefix in ("00353", "353"):
+        if d.startswith(prefix) and len(d) > len(prefix) + 6:
+            d = "0" + d[len(prefix):].lstrip("0")
+            break
+    return d if len(d) >= 7 else None
+
+def name_tokens(name):
+    """Lowercase ASCII word tokens of a name (accents stripped, O'Brien -> obrien)."""
+    s = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode().lower()
+    return re.findall(r"[a-z]+", s.replace("'", ""))
+
+def name_key(name):
+    """Surname plus first initial ("murphy a"); None without at least two tokens."""
+    tokens = name_tokens(name)
+    return f"{tokens[-1]} {tokens[0][0]}" if len(tokens) >= 2 else None
+
+def identity_keys(name, email, phone):
+    return normalize_email(email), phone_digits(phone), name_key(name)
 
-    # Interviews (notes)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS interviews (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+def _add_identity_keys(conn):
+    for column in ("email_norm", "phone_digits", "name_key"):
+        _add_column(conn, "candidates", column, "TEXT")
+    _add_column(conn, "candidates", "duplicate_of", "INTEGER REFERENCES candidates(id)")
+    conn.create_function("normalize_email", 1, normalize_email, deterministic=True)
+    conn.create_function("phone_digits", 1, phone_digits, deterministic=True)
+    conn.create_function("name_key", 1, name_key, deterministic=True)
+    conn.execute("UPDATE candidates SET email_norm = normalize_email(email), phone_digits = phone_digits(phone), "
+                 "name_key = name_key(name)")
+    for column in ("email_norm", "phone_digits", "name_key"):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_candidates_{column} ON candidates({column}) "
+                     f"WHERE {column} IS NOT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_candidates_duplicate_of ON candidates(duplicate_of) "
+                 "WHERE duplicate_of IS NOT NULL")
+
+def _add_dnc_columns(conn):
+    """County and Do-Not-Call state per candidate (see dnc.py); DNC changes go to the change log."""
+    _add_column(conn, "candidates", "location", "TEXT")       # county/address as supplied
+    _add_column(conn, "candidates", "county", "TEXT")         # canonical county, when recognised
+    _add_column(conn, "candidates", "dnc", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "candidates", "dnc_reason", "TEXT")
+    _add_column(conn, "candidates", "dnc_override", "INTEGER")  # NULL = automatic, 0/1 = set by hand
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_candidates_dnc ON candidates(id) WHERE dnc = 1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_candidates_dnc_override ON candidates(id) "
+                 "WHERE dnc_override IS NOT NULL")
+    summary, watched = CHANGE_SOURCES["candidates"]
+    conn.execute("DROP TRIGGER IF EXISTS trg_changes_candidates_update")
+    _change_trigger(conn, "candidates", "UPDATE", summary, watched + ("county", "dnc", "dnc_override"))
+
+def split_keywords(keywords):
+    """Split a campaign's "A; B, C" keyword string into distinct, stripped terms."""
+    terms = re.split(r"[;,\n]", keywords or "")
+    return list(dict.fromkeys(t.strip() for t in terms if t.strip()))
+
+def link_campaign_keywords(conn, campaign_id, keywords):
+    """Point campaign_keywords rows at each term of `keywords` that is already a keyword; returns the rest.
+
+    Terms match existing keywords case-insensitively. Unknown terms are not added to the
+    scoring keyword set (that would re-version every stored score); add_keyword links them
+    when they are added. Run inside transaction().
+    """
+    missing = []
+    for term in split_keywords(keywords):
+        row = conn.execute("SELECT id FROM keywords WHERE term = ? COLLATE NOCASE ORDER BY id LIMIT 1",
+                           (term,)).fetchone()
+        if row is None:
+            missing.append(term)
+            continue
+        conn.execute("INSERT OR IGNORE INTO campaign_keywords (campaign_id, keyword_id) VALUES (?, ?)",
+                     (campaign_id, row[0]))
+    return missing
+
+def _link_keyword_to_campaigns(conn, term):
+    """Link a newly added keyword to the campaigns that already list it."""
+    row = conn.execute("SELECT id FROM keywords WHERE term = ? COLLATE NOCASE ORDER BY id LIMIT 1", (term,)).fetchone()
+    if row is None:
+        return
+    for c in conn.execute("SELECT id, keywords FROM campaigns WHERE keywords LIKE ?", (f"%{term}%",)).fetchall():
+        if term.lower() in {t.lower() for t in split_keywords(c["keywords"])}:
+            conn.execute("INSERT OR IGNORE INTO campaign_keywords (campaign_id, keyword_id) VALUES (?, ?)",
+                         (c["id"], row[0]))
+
+def _backfill_campaign_keywords(conn):
+    for r in conn.execute("SELECT id, keywords FROM campaigns WHERE keywords IS NOT NULL").fetchall():
+        link_campaign_keywords(conn, r["id"], r["keywords"])
+
+# Append-only list of (version, name, steps); a step is a SQL string or a callable(conn).
+# Never edit an entry once released: add a new version instead.
+MIGRATIONS = [
+    (1, "indexes for hot lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_candidates_email ON candidates(email)",
+        "CREATE INDEX IF NOT EXISTS idx_candidates_created_at ON candidates(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_candidates_is_test ON candidates(is_test)",
+        "CREATE INDEX IF NOT EXISTS idx_attachments_candidate ON attachments(candidate_id)",
+        "CREATE INDEX IF NOT EXISTS idx_test_scores_candidate ON test_scores(candidate_id)",
+        "CREATE INDEX IF NOT EXISTS idx_interviews_candidate ON interviews(candidate_id)",
+        "CREATE INDEX IF NOT EXISTS idx_campaigns_created_at ON campaigns(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_created_at ON audit_logs(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_candidate_scores_rank ON candidate_scores(keyword_version, threshold, score)",
+    ]),
+    (2, "trigger-maintained dashboard stats", [_create_stats]),
+    (3, "candidate list filters", [
+        # SQLite appends the rowid to every index, so these also serve ORDER BY id.
+        "CREATE INDEX IF NOT EXISTS idx_candidates_source ON candidates(source)",
+    ]),
+    (4, "full-text candidate search", [_create_candidate_search]),
+    (5, "keyword -> candidate inverted index", [
+        """
+        CREATE TABLE IF NOT EXISTS keyword_matches (
+            keyword_version TEXT NOT NULL,
+            term TEXT NOT NULL,
             candidate_id INTEGER NOT NULL,
-            notes TEXT,
-            date TEXT,
-            recorded_at TEXT NOT NULL DEFAULT (datetime('now')),
-            is_test INTEGER NOT NULL DEFAULT 0,
+            match REAL NOT NULL,
+            PRIMARY KEY (keyword_version, term, candidate_id),
             FOREIGN KEY(candidate_id) REFERENCES candidates(id) ON DELETE CASCADE
         )
-    """)
+        """,
+        # Postings for one term above a threshold are a single range scan.
+        "CREATE INDEX IF NOT EXISTS idx_keyword_matches_term ON keyword_matches(keyword_version, term, match, candidate_id)",
+        "CREATE INDEX IF NOT EXISTS idx_keyword_matches_candidate ON keyword_matches(candidate_id)",
+    ]),
+    (6, "campaign keywords join table", [
+        """
+        CREATE TABLE IF NOT EXISTS campaign_keywords (
+            campaign_id INTEGER NOT NULL,
+            keyword_id INTEGER NOT NULL,
+            PRIMARY KEY (campaign_id, keyword_id),
+            FOREIGN KEY(campaign_id) REFERENCES campaigns(id) ON DELETE CASCADE,
+            FOREIGN KEY(keyword_id) REFERENCES keywords(id) ON DELETE CASCADE
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_campaign_keywords_keyword ON campaign_keywords(keyword_id, campaign_id)",
+        "CREATE INDEX IF NOT EXISTS idx_keywords_term_nocase ON keywords(term COLLATE NOCASE)",
+        _backfill_campaign_keywords,
+    ]),
+    (7, "candidate identity keys", [_add_identity_keys]),
+    (8, "audit log lookups", [
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON audit_logs(user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_logs_action ON audit_logs(action, created_at)",
+    ]),
+    (9, "change-data capture", [_create_changes]),
+    (10, "county-based do-not-call", [_add_dnc_columns]),
+    # 11 was a keyword cleanup that has been withdrawn; databases that ran it keep the record.
+    (12, "search index follows moved interviews", [_search_interview_updates]),
+]
 
-    # Audit logs
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS audit_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            action TEXT NOT NULL,
-            details TEXT,
-            created_at TEXT NOT NULL DEFAULT (datetime('now'))
-        )
-    """)
+def migrate():
+    """Apply pending MIGRATIONS in order, each in its own transaction; returns versions applied."""
+    applied = []
+    for version, name, steps in MIGRATIONS:
+        with transaction() as conn:
+            # Re-checked under the write lock so concurrent starters apply each version once.
+            if conn.execute("SELECT 1 FROM schema_version WHERE version=?", (version,)).fetchone():
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                         (version, name, datetime.utcnow().isoformat()))
+        applied.append(version)
+    if applied:
+        # Data migrations may have written reference tables behind the cache's back.
+        invalidate_cache()
+    return applied
+
+def applied_migrations():
+    """[{version, name, applied_at}] for every migration recorded in this database."""
+    with connection() as conn:
+        rows = conn.execute("SELECT version, name, applied_at FROM schema_version ORDER BY version").fetchall()
+    return [dict(r) for r in rows]
+
+def pending_migrations():
+    done = {m["version"] for m in applied_migrations()}
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in done]
+
+# --- Reference-data cache ---
+# Small, read-mostly tables (keywords, campaigns, counties) are cached per process and
+# shared by every session. Write helpers invalidate their entry; the TTL bounds staleness
+# for writes made by another process.
+CACHE_TTL = 300  # seconds
+
+_cache = {}          # name -> (expires_at, value)
+_cache_gen = {}      # name -> bumped on invalidate, so an in-flight load can't store stale data
+_cache_counters = {}  # name -> {"hits", "misses", "invalidations"}
+_cache_lock = threading.Lock()
+
+def _counters(name):
+    return _cache_counters.setdefault(name, {"hits": 0, "misses": 0, "invalidations": 0})
+
+def _cached(name, loader):
+    """Return a copy of the cached value for `name`, loading it on a miss or after CACHE_TTL."""
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(name)
+        if entry is not None and entry[0] > now:
+            _counters(name)["hits"] += 1
+            value = entry[1]
+        else:
+            _counters(name)["misses"] += 1
+            value = None
+            gen = _cache_gen.get(name, 0)
+    if value is None:
+        value = loader()
+        with _cache_lock:
+            if _cache_gen.get(name, 0) == gen:
+                _cache[name] = (now + CACHE_TTL, value)
+    return [dict(v) if isinstance(v, dict) else v for v in value]
+
+def invalidate_cache(name=None):
+    """Drop one cached dataset, or all of them when name is None."""
+    with _cache_lock:
+        for n in ([name] if name else list(set(_cache) | set(_cache_gen))):
+            _cache.pop(n, None)
+            _cache_gen[n] = _cache_gen.get(n, 0) + 1
+            _counters(n)["invalidations"] += 1
+
+def cache_stats():
+    """{name: {"hits", "misses", "invalidations", "cached"}} for the reference-data cache."""
+    with _cache_lock:
+        return {n: {**c, "cached": n in _cache} for n, c in _cache_counters.items()}
 
-    conn.commit()
-    conn.close()
+# --- Dashboard stats ---
+def stats_totals():
+    """{metric: {"all": n, "test": n}} from the ('*', '*') rows: one primary-key seek per (metric, is_test)."""
+    metrics = [m for m, _, _, _ in STATS_SOURCES.values()]
+    with connection() as conn:
+        rows = conn.execute(f"""
+            SELECT metric, is_test, count FROM stats
+            WHERE metric IN ({','.join('?' * len(metrics))}) AND is_test IN (0, 1) AND source = '*' AND day = '*'
+        """, metrics).fetchall()
+    out = {}
+    for r in rows:
+        m = out.setdefault(r["metric"], {"all": 0, "test": 0})
+        m["all"] += r["count"]
+        if r["is_test"]:
+            m["test"] += r["count"]
+    return out
+
+def stats_by_source(metric):
+    with connection() as conn:
+        rows = conn.execute("""
+            SELECT source, is_test, SUM(count) AS count FROM stats
+            WHERE metric=? AND source != '*' GROUP BY source, is_test ORDER BY count DESC
+        """, (metric,)).fetchall()
+    return [dict(r) for r in rows]
+
+def stats_by_day(metric, since=None, is_test=None):
+    sql = "SELECT day, SUM(count) AS count FROM stats WHERE metric=? AND day != '*'"
+    params = [metric]
+    if since:
+        sql += " AND day >= ?"
+        params.append(since)
+    if is_test is not None:
+        sql += " AND is_test = ?"
+        params.append(int(is_test))
+    with connection() as conn:
+        rows = conn.execute(sql + " GROUP BY day ORDER BY day", params).fetchall()
+    return [dict(r) for r in rows]
 
 # --- Campaigns ---
 def add_campaign(name, hours=None, keywords=None, notes=None):
-    conn = get_conn()
-    _exec(conn, """
-        INSERT INTO campaigns (name, hours, keywords, notes, created_at)
-        VALUES (?, ?, ?, ?, ?)
-    """, (name, hours, keywords, notes, datetime.utcnow().isoformat()))
-    conn.close()
+    with transaction() as conn:
+        cur = conn.execute("""
+            INSERT INTO campaigns (name, hours, keywords, notes, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, (name, hours, keywords, notes, datetime.utcnow().isoformat()))
+        cid = cur.lastrowid
+        missing = link_campaign_keywords(conn, cid, keywords)
+    invalidate_cache("campaigns")
+    audit.record("campaign_add", campaign_id=cid, name=name, keywords=keywords, not_in_keyword_set=missing)
+    return cid
+
+def add_campaigns(rows):
+    """Insert (name, hours, keywords, notes) tuples and their keyword links in one transaction.
+
+    Returns the distinct terms that aren't in the keyword set (not used for ranking).
+    """
+    rows = list(rows)
+    now = datetime.utcnow().isoformat()
+    missing = {}
+    with transaction() as conn:
+        for name, hours, keywords, notes in rows:
+            cur = conn.execute("""
+                INSERT INTO campaigns (name, hours, keywords, notes, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (name, hours, keywords, notes, now))
+            for term in link_campaign_keywords(conn, cur.lastrowid, keywords):
+                missing.setdefault(term.lower(), term)
+    invalidate_cache("campaigns")
+    audit.record("campaign_import", campaigns=len(rows), names=[r[0] for r in rows][:20],
+                 not_in_keyword_set=list(missing.values())[:50])
+    return list(missing.values())
+
+def campaign_keywords(campaign_id):
+    """[{term, tier}] linked to a campaign."""
+    with connection() as conn:
+        rows = conn.execute("""
+            SELECT k.term, k.tier FROM campaign_keywords ck JOIN keywords k ON k.id = ck.keyword_id
+            WHERE ck.campaign_id = ? ORDER BY k.tier, k.term
+        """, (campaign_id,)).fetchall()
+    return [dict(r) for r in rows]
+
+def campaign_missing_terms(campaign_id):
+    """Terms in a campaign's keyword string that aren't linked to a keyword (so not used for ranking)."""
+    with connection() as conn:
+        row = conn.execute("SELECT keywords FROM campaigns WHERE id = ?", (campaign_id,)).fetchone()
+        linked = {r[0].lower() for r in conn.execute("""
+            SELECT k.term FROM campaign_keywords ck JOIN keywords k ON k.id = ck.keyword_id WHERE ck.campaign_id = ?
+        """, (campaign_id,))}
+    return [t for t in split_keywords(row["keywords"] if row else None) if t.lower() not in linked]
+
+def campaigns_with_keyword(term):
+    """Campaigns linked to `term` (case-insensitive), via the keyword_id index."""
+    with connection() as conn:
+        rows = conn.execute("""
+            SELECT c.id, c.name, c.hours, c.keywords, c.notes, c.created_at
+            FROM keywords k
+            JOIN campaign_keywords ck ON ck.keyword_id = k.id
+            JOIN campaigns c ON c.id = ck.campaign_id
+            WHERE k.term = ? COLLATE NOCASE ORDER BY c.created_at DESC
+        """, (term,)).fetchall()
+    return [dict(r) for r in rows]
+
+def search_campaigns(text):
+    """Campaigns linked to keyword `text` (exact, case-insensitive) or whose name contains it.
+
+    The keyword side is campaigns_with_keyword's indexed join; names are matched against
+    the cached campaign list, so neither reads the campaigns table row by row.
+    """
+    by_keyword = campaigns_with_keyword(text)
+    seen = {r["id"] for r in by_keyword}
+    needle = text.lower()
+    by_name = [c for c in list_campaigns() if needle in (c["name"] or "").lower() and c["id"] not in seen]
+    return sorted(by_keyword + by_name, key=lambda r: r["created_at"] or "", reverse=True)
+
+def _load_campaigns():
+    with connection() as conn:
+        rows = _exec(conn, "SELECT id, name, hours, keywords, notes, created_at FROM campaigns ORDER BY created_at DESC").fetchall()
+    return [dict(r) for r in rows]
 
 def list_campaigns():
-    conn = get_conn()
-    rows = _exec(conn, "SELECT id, name, hours, keywords, notes, created_at FROM campaigns ORDER BY created_at DESC").fetchall()
-    conn.close()
-    return [dict(zip([c[0] for c in rows.cursor.description], r)) if hasattr(rows, 'cursor') else dict(r) for r in rows]  # defensive
-    # (Streamlit will mostly use its own dataframe creation; safe to ignore if not used.)
+    return _cached("campaigns", _load_campaigns)
 
 # --- Counties ---
 def add_county(name):
     if not name or not name.strip():
         return
-    conn = get_conn()
-    try:
-        _exec(conn, "INSERT INTO counties(name) VALUES(?)", (name.strip(),))
-    except sqlite3.IntegrityError:
-        pass
-    conn.close()
+    with connection() as conn:
+        try:
+            _exec(conn, "INSERT INTO counties(name) VALUES(?)", (name.strip(),))
+        except sqlite3.IntegrityError:
+            return
+    invalidate_cache("counties")
+    audit.record("county_add", county=name.strip())
 
 def add_counties(names):
-    for n in names:
-        add_county(n)
+    """Insert new counties in one transaction, skipping blanks and existing names; returns how many were added."""
+    names = list(dict.fromkeys(n.strip() for n in names if n and n.strip()))
+    if not names:
+        return 0
+    with transaction() as conn:
+        added = conn.executemany("INSERT OR IGNORE INTO counties(name) VALUES(?)", [(n,) for n in names]).rowcount
+    invalidate_cache("counties")
+    if added:
+        audit.record("county_add", counties=names, added=added)
+    return added
+
+def _load_counties():
+    with connection() as conn:
+        rows = _exec(conn, "SELECT name FROM counties ORDER BY name").fetchall()
+    return [r["name"] for r in rows]
 
 def get_counties():
-    conn = get_conn()
-    rows = _exec(conn, "SELECT name FROM counties ORDER BY name").fetchall()
-    conn.close()
-    return rows
+    return _cached("counties", _load_counties)
 
 def remove_county(name):
-    conn = get_conn()
-    _exec(conn, "DELETE FROM counties WHERE name=?", (name,))
-    conn.close()
+    with connection() as conn:
+        removed = _exec(conn, "DELETE FROM counties WHERE name=?", (name,)).rowcount
+    invalidate_cache("counties")
+    if removed:
+        audit.record("county_remove", county=name)
 
 # --- Candidates & related (for ingestion.py expectations) ---
 def add_candidate(name=None, email=None, phone=None, source=None, resume_text=None, notes=None, is_test=0):
-    conn = get_conn()
-    cur = _exec(conn, """
-        INSERT INTO candidates (name, email, phone, source, resume_text, notes, is_test, created_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    """, (name, email, phone, source, resume_text, notes, int(is_test), datetime.utcnow().isoformat()))
-    cid = cur.lastrowid
-    conn.close()
-    return cid
+    with transaction() as conn:
+        return insert_candidates(conn, [(name, email, phone, source, resume_text, notes, int(is_test),
+                                         datetime.utcnow().isoformat())])[0]
+
+NO_DNC = (None, None, 0, None)
+
+def insert_candidates(conn, rows, dnc=None):
+    """executemany-insert candidate tuples on `conn` and return their new ids.
+
+    rows: list of (name, email, phone, source, resume_text, notes, is_test, created_at).
+    dnc: optional matching list of (location, county, dnc, dnc_reason), see dnc.evaluate_many.
+    Identity keys (email_norm, phone_digits, name_key) are filled in from name/email/phone.
+    Must run inside transaction(): the write lock keeps the AUTOINCREMENT range contiguous.
+    """
+    if not rows:
+        return []
+    seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name='candidates'").fetchone()
+    start = seq[0] if seq else 0
+    conn.executemany("""
+        INSERT INTO candidates (name, email, phone, source, resume_text, notes, is_test, created_at,
+                                email_norm, phone_digits, name_key, location, county, dnc, dnc_reason)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [tuple(r) + identity_keys(r[0], r[1], r[2]) + tuple(d)
+          for r, d in zip(rows, dnc or [NO_DNC] * len(rows))])
+    return list(range(start + 1, start + 1 + len(rows)))
+
+# `bare`: a stub created by an assessment/interview import (no name, no resume).
+IDENTITY_COLUMNS = ("id", "name", "email_norm", "phone_digits", "name_key", "duplicate_of",
+                    "(name IS NULL AND resume_text IS NULL) AS bare")
+
+def candidates_sharing_keys(conn, emails=(), phones=(), name_keys=(), name_block_limit=50):
+    """Candidates whose email_norm, phone_digits or name_key is one of the given keys.
+
+    Emails and phones are indexed IN lookups in chunks of 500. Name keys are common, so each
+    one reads only its `name_block_limit` newest rows off the index. Returns {id: row dict
+    with IDENTITY_COLUMNS}.
+    """
+    cols = ", ".join(IDENTITY_COLUMNS)
+    out = {}
+    for column, keys in (("email_norm", emails), ("phone_digits", phones)):
+        keys = [k for k in dict.fromkeys(keys) if k]
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            for r in conn.execute(f"SELECT {cols} FROM candidates WHERE {column} IN ({','.join('?' * len(chunk))})",
+                                  chunk):
+                out[r["id"]] = dict(r)
+    for key in dict.fromkeys(k for k in name_keys if k):
+        for r in conn.execute(f"SELECT {cols} FROM candidates WHERE name_key = ? ORDER BY id DESC LIMIT ?",
+                              (key, int(name_block_limit))):
+            out[r["id"]] = dict(r)
+    return out
+
+def set_duplicate_links(conn, links):
+    """links: iterable of (duplicate_id, master_id); run inside transaction()."""
+    conn.executemany("UPDATE candidates SET duplicate_of = ? WHERE id = ? AND id != ?",
+                     [(master, dup, master) for dup, master in links])
+
+def replace_stub_masters(conn, replacements):
+    """replacements: iterable of (stub_id, new_master_id); run inside transaction().
+
+    The stub and anything linked to it become duplicates of the new master, which also takes
+    over the stub's assessments, interviews and attachments.
+    """
+    for stub, new in replacements:
+        conn.execute("UPDATE candidates SET duplicate_of = NULL WHERE id = ?", (new,))
+        conn.execute("UPDATE candidates SET duplicate_of = ? WHERE (id = ? OR duplicate_of = ?) AND id != ?",
+                     (new, stub, stub, new))
+        for table in ("test_scores", "interviews", "attachments"):
+            conn.execute(f"UPDATE {table} SET candidate_id = ? WHERE candidate_id = ?", (new, stub))
+
+def stubs_masking_applications(conn):
+    """(stub_id, earliest real duplicate id) for bare stubs that other candidates were linked under."""
+    return [tuple(r) for r in conn.execute("""
+        SELECT s.id, MIN(d.id) FROM candidates s JOIN candidates d ON d.duplicate_of = s.id
+        WHERE s.duplicate_of IS NULL AND s.name IS NULL AND s.resume_text IS NULL
+          AND NOT (d.name IS NULL AND d.resume_text IS NULL)
+        GROUP BY s.id
+    """)]
+
+def candidate_identity_rows(conn, after_id=0, limit=5000):
+    """Unlinked candidates with id > after_id in id order, for a de-duplication pass."""
+    rows = conn.execute(f"""
+        SELECT {", ".join(IDENTITY_COLUMNS)} FROM candidates
+        WHERE id > ? AND duplicate_of IS NULL ORDER BY id LIMIT ?
+    """, (int(after_id), int(limit))).fetchall()
+    return [dict(r) for r in rows]
+
+def count_duplicates():
+    with connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM candidates WHERE duplicate_of IS NOT NULL").fetchone()[0]
 
 def find_candidate_by_email(email):
-    conn = get_conn()
-    row = _exec(conn, "SELECT * FROM candidates WHERE email=? ORDER BY id DESC LIMIT 1", (email,)).fetchone()
-    conn.close()
+    """The candidate record for an email (any case/spacing), following duplicate links to the master."""
+    with connection() as conn:
+        row = _exec(conn, """
+            SELECT * FROM candidates WHERE id = (
+                SELECT COALESCE(duplicate_of, id) FROM candidates WHERE email_norm = ? ORDER BY id DESC LIMIT 1)
+        """, (normalize_email(email),)).fetchone()
     return dict(row) if row else None
 
-def add_test_score(candidate_id, source, score, notes=None, is_test=0):
-    conn = get_conn()
-    _exec(conn, """
+def resolve_candidate_emails(conn, emails, is_test=0):
+    """Map each (normalized) email to its candidate id on `conn`, creating bare candidates for unknown ones.
+
+    Matches on email_norm and follows duplicate_of, so scores and notes attach to the master
+    record. One indexed IN lookup per 500 emails instead of a query per row; run inside transaction().
+    """
+    emails = list(dict.fromkeys(emails))
+    found = {}
+    for i in range(0, len(emails), 500):
+        chunk = emails[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        # Bare columns take their values from the MAX(id) row: the newest record's master.
+        for r in conn.execute(f"SELECT email_norm, COALESCE(duplicate_of, id), MAX(id) FROM candidates "
+                              f"WHERE email_norm IN ({marks}) GROUP BY email_norm", chunk):
+            found[r[0]] = r[1]
+    missing = [e for e in emails if e not in found]
+    now = datetime.utcnow().isoformat()
+    new_ids = insert_candidates(conn, [(None, e, None, None, None, None, int(is_test), now) for e in missing])
+    found.update(zip(missing, new_ids))
+    return found
+
+def insert_test_scores(conn, rows):
+    """rows: (candidate_id, source, score, notes, recorded_at, is_test) tuples."""
+    conn.executemany("""
         INSERT INTO test_scores (candidate_id, source, score, notes, recorded_at, is_test)
         VALUES (?, ?, ?, ?, ?, ?)
-    """, (candidate_id, source, score, notes, datetime.utcnow().isoformat(), int(is_test)))
-    conn.close()
+    """, rows)
 
-def add_interview_note(candidate_id, notes, date=None, is_test=0):
-    conn = get_conn()
-    _exec(conn, """
+def insert_interview_notes(conn, rows):
+    """rows: (candidate_id, notes, date, recorded_at, is_test) tuples."""
+    conn.executemany("""
         INSERT INTO interviews (candidate_id, notes, date, recorded_at, is_test)
         VALUES (?, ?, ?, ?, ?)
-    """, (candidate_id, notes, date, datetime.utcnow().isoformat(), int(is_test)))
-    conn.close()
+    """, rows)
+
+# --- Streaming ingest checkpoints ---
+def find_open_ingest_job(fingerprint, kind, is_test=0):
+    with connection() as conn:
+        row = _exec(conn, """
+            SELECT * FROM ingest_jobs WHERE fingerprint=? AND kind=? AND is_test=? AND status='running'
+            ORDER BY id DESC LIMIT 1
+        """, (fingerprint, kind, int(is_test))).fetchone()
+    return dict(row) if row else None
+
+def start_ingest_job(fingerprint, kind, chunksize, is_test=0):
+    with connection() as conn:
+        now = datetime.utcnow().isoformat()
+        cur = _exec(conn, """
+            INSERT INTO ingest_jobs (fingerprint, kind, is_test, chunksize, started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (fingerprint, kind, int(is_test), int(chunksize), now, now))
+        job_id = cur.lastrowid
+    return {"id": job_id, "fingerprint": fingerprint, "kind": kind, "is_test": int(is_test),
+            "chunksize": int(chunksize), "chunks_done": 0, "rows_done": 0, "status": "running"}
+
+def advance_ingest_job(conn, job_id, rows):
+    """Record one committed chunk; call on the chunk's own transaction so both commit together."""
+    conn.execute("""
+        UPDATE ingest_jobs SET chunks_done = chunks_done + 1, rows_done = rows_done + ?, updated_at = ?
+        WHERE id = ?
+    """, (int(rows), datetime.utcnow().isoformat(), job_id))
+
+def finish_ingest_job(job_id, status="done"):
+    with connection() as conn:
+        _exec(conn, "UPDATE ingest_jobs SET status=?, updated_at=? WHERE id=?",
+              (status, datetime.utcnow().isoformat(), job_id))
+
+def add_test_score(candidate_id, source, score, notes=None, is_test=0):
+    with connection() as conn:
+        _exec(conn, """
+            INSERT INTO test_scores (candidate_id, source, score, notes, recorded_at, is_test)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (candidate_id, source, score, notes, datetime.utcnow().isoformat(), int(is_test)))
+
+def add_interview_note(candidate_id, notes, date=None, is_test=0):
+    with connection() as conn:
+        _exec(conn, """
+            INSERT INTO interviews (candidate_id, notes, date, recorded_at, is_test)
+            VALUES (?, ?, ?, ?, ?)
+        """, (candidate_id, notes, date, datetime.utcnow().isoformat(), int(is_test)))
+
+# Columns for candidate tables; resume_text is fetched separately for the rows that need it.
+CANDIDATE_LIST_COLUMNS = ("id", "name", "email", "source", "is_test", "created_at")
+
+def _date_id_bounds(date_from=None, date_to=None):
+    """(where clauses, params) restricting candidates to inclusive ISO dates, or None if no row matches.
+
+    The smallest and largest id in the date range come from one covering scan of the
+    created_at index (~20 ms per 100k rows in range), so pages and exports can walk id
+    order. Ids need not follow created_at (backdated imports): the id range only narrows
+    the scan and the (unindexed, "+") date checks keep it exact.
+    """
+    where, params = [], []
+    if date_from:
+        where.append("created_at >= ?")
+        params.append(str(date_from))
+    if date_to:
+        # Inclusive day: anything before the following midnight.
+        where.append("created_at < date(?, '+1 day')")
+        params.append(str(date_to))
+    with connection() as conn:
+        lo, hi = conn.execute(f"SELECT MIN(id), MAX(id) FROM candidates "
+                              f"WHERE {' AND '.join(where)}", params).fetchone()
+    if lo is None:
+        return None
+    return ["id BETWEEN ? AND ?"] + ["+" + w for w in where], [lo, hi] + params
+
+def list_candidates_page(after_id=None, limit=50, source=None, is_test=None,
+                         date_from=None, date_to=None, email_prefix=None, include_duplicates=False):
+    """One newest-first page of candidates, keyset-paginated on id.
+
+    Pass the returned cursor as `after_id` for the next page; it is None on the last
+    page. date_from/date_to are inclusive ISO dates (YYYY-MM-DD). Records linked to
+    another candidate (duplicate_of) are left out unless include_duplicates.
+    """
+    where, params = [], []
+    if not include_duplicates:
+        where.append("duplicate_of IS NULL")
+    if after_id is not None:
+        where.append("id < ?")
+        params.append(int(after_id))
+    if source:
+        where.append("source = ?")
+        params.append(source)
+    if is_test is not None:
+        where.append("is_test = ?")
+        params.append(int(is_test))
+    if date_from or date_to:
+        bounds = _date_id_bounds(date_from, date_to)
+        if bounds is None:
+            return [], None
+        where.extend(bounds[0])
+        params.extend(bounds[1])
+    email_prefix = normalize_email(email_prefix)
+    if email_prefix:
+        # Range on the email_norm index instead of LIKE, which can't use it.
+        where.append("email_norm >= ? AND email_norm < ?")
+        params.extend([email_prefix, email_prefix[:-1] + chr(ord(email_prefix[-1]) + 1)])
+    sql = f"SELECT {', '.join(CANDIDATE_LIST_COLUMNS)} FROM candidates"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(int(limit) + 1)
+    with connection() as conn:
+        rows = [dict(r) for r in conn.execute(sql, params).fetchall()]
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
+
+# --- Export ---
+EXPORT_COLUMNS = ("id", "name", "email", "phone", "source", "is_test", "created_at", "notes", "duplicate_of",
+                  "assessments", "best_assessment_score", "latest_assessment_score",
+                  "interviews", "last_interview_date", "interview_notes",
+                  "keyword_score", "keyword_hits", "scored_at")
+
+def iter_export_rows(is_test=None, date_from=None, date_to=None, keyword_version=None, threshold=85,
+                     batch_size=5000):
+    """Yield lists of up to batch_size export tuples (EXPORT_COLUMNS), oldest candidate first.
+
+    Per-candidate aggregates are correlated subqueries on the candidate_id indexes, so the
+    join runs in SQLite and only one batch is held in Python at a time.
+    """
+    where, params = [], []
+    if is_test is not None:
+        where.append("is_test = ?")
+        params.append(int(is_test))
+    if date_from or date_to:
+        bounds = _date_id_bounds(date_from, date_to)
+        if bounds is None:
+            return
+        where.extend(bounds[0])
+        params.extend(bounds[1])
+    sql = f"""
+        SELECT c.id, c.name, c.email, c.phone, c.source, c.is_test, c.created_at, c.notes, c.duplicate_of,
+               (SELECT COUNT(*) FROM test_scores t WHERE t.candidate_id = c.id),
+               (SELECT MAX(t.score) FROM test_scores t WHERE t.candidate_id = c.id),
+               (SELECT t.score FROM test_scores t WHERE t.candidate_id = c.id ORDER BY t.id DESC LIMIT 1),
+               (SELECT COUNT(*) FROM interviews i WHERE i.candidate_id = c.id),
+               (SELECT MAX(i.date) FROM interviews i WHERE i.candidate_id = c.id),
+               (SELECT group_concat(n, ' | ') FROM
+                   (SELECT i.notes AS n FROM interviews i WHERE i.candidate_id = c.id ORDER BY i.id)),
+               s.score, s.hits, s.scored_at
+        FROM (SELECT * FROM candidates {"WHERE " + " AND ".join(where) if where else ""}) c
+        LEFT JOIN candidate_scores s
+          ON s.candidate_id = c.id AND s.keyword_version = ? AND s.threshold = ?
+        ORDER BY c.id
+    """
+    params.extend([keyword_version, float(threshold)])
+    with connection() as conn:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [tuple(r) for r in rows]
+
+def _fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    return " ".join(f'"{w}"*' for w in re.findall(r"\w+", text or ""))
+
+def search_candidates(text, limit=20, is_test=None):
+    """Best-first (bm25) candidates matching `text` in name, resume, notes or interview notes.
+
+    Each row carries a short `snippet` with the matched words in [brackets].
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    with connection() as conn:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name='candidate_search'").fetchone() is None:
+            return _search_candidates_like(conn, text, limit, is_test)
+        sql = """
+            SELECT c.id, c.name, c.email, c.source, c.is_test, c.created_at,
+                   bm25(candidate_search, 2.0, 1.0, 1.0, 1.0) AS rank,
+                   snippet(candidate_search, -1, '[', ']', '…', 12) AS snippet
+            FROM candidate_search JOIN candidates c ON c.id = candidate_search.rowid
+            WHERE candidate_search MATCH ? AND c.duplicate_of IS NULL
+        """
+        params = [query]
+        if is_test is not None:
+            sql += " AND c.is_test = ?"
+            params.append(int(is_test))
+        rows = conn.execute(sql + " ORDER BY rank LIMIT ?", (*params, int(limit))).fetchall()
+    return [dict(r) for r in rows]
+
+def _search_candidates_like(conn, text, limit, is_test):
+    # Only used when this SQLite build lacks FTS5: unranked substring match, full scan.
+    pattern = f"%{text.strip()}%"
+    sql = """
+        SELECT id, name, email, source, is_test, created_at, NULL AS rank, substr(resume_text, 1, 120) AS snippet
+        FROM candidates WHERE (resume_text LIKE ? OR notes LIKE ?) AND duplicate_of IS NULL
+    """
+    params = [pattern, pattern]
+    if is_test is not None:
+        sql += " AND is_test = ?"
+        params.append(int(is_test))
+    rows = conn.execute(sql + " ORDER BY id DESC LIMIT ?", (*params, int(limit))).fetchall()
+    return [dict(r) for r in rows]
+
+def get_resume_texts(candidate_ids):
+    ids = list(candidate_ids)
+    out = {}
+    with connection() as conn:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for r in _exec(conn, f"SELECT id, resume_text FROM candidates WHERE id IN ({marks})", chunk).fetchall():
+                out[r["id"]] = r["resume_text"]
+    return out
+
+# --- Stored candidate scores ---
+def get_candidate_scores(candidate_ids, keyword_version, threshold):
+    ids = list(candidate_ids)
+    out = {}
+    with connection() as conn:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = _exec(conn, f"""
+                SELECT candidate_id, resume_hash, score, hits, scored_at FROM candidate_scores
+                WHERE keyword_version=? AND threshold=? AND candidate_id IN ({marks})
+            """, (keyword_version, float(threshold), *chunk)).fetchall()
+            for r in rows:
+                out[r["candidate_id"]] = {"resume_hash": r["resume_hash"], "score": r["score"],
+                                          "hits": json.loads(r["hits"] or "[]"), "scored_at": r["scored_at"]}
+    return out
+
+def save_candidate_scores(rows):
+    """rows: iterable of (candidate_id, keyword_version, threshold, resume_hash, score, hits)."""
+    now = datetime.utcnow().isoformat()
+    params = [(cid, ver, float(th), h, float(score), json.dumps(hits), now) for cid, ver, th, h, score, hits in rows]
+    if not params:
+        return
+    with transaction() as conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO candidate_scores
+                (candidate_id, keyword_version, threshold, resume_hash, score, hits, scored_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, params)
+
+def get_candidate_matches(candidate_ids, keyword_version):
+    ids = list(candidate_ids)
+    out = {}
+    with connection() as conn:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = _exec(conn, f"""
+                SELECT candidate_id, resume_hash, matches FROM candidate_matches
+                WHERE keyword_version=? AND candidate_id IN ({marks})
+            """, (keyword_version, *chunk)).fetchall()
+            for r in rows:
+                out[r["candidate_id"]] = (r["resume_hash"], r["matches"])
+    return out
+
+def save_candidate_matches(rows, postings=()):
+    """Store match rows and replace those candidates' inverted-index postings in one transaction.
+
+    rows: iterable of (candidate_id, keyword_version, resume_hash, matches_blob).
+    postings: iterable of (keyword_version, term, candidate_id, match) for keyword_matches.
+    """
+    now = datetime.utcnow().isoformat()
+    params = [(cid, ver, h, blob, now) for cid, ver, h, blob in rows]
+    if not params:
+        return
+    ids = [p[0] for p in params]
+    with transaction() as conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO candidate_matches (candidate_id, keyword_version, resume_hash, matches, scored_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, params)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            conn.execute(f"DELETE FROM keyword_matches WHERE candidate_id IN ({','.join('?' * len(chunk))})", chunk)
+        conn.executemany("""
+            INSERT OR REPLACE INTO keyword_matches (keyword_version, term, candidate_id, match) VALUES (?, ?, ?, ?)
+        """, postings)
+
+# --- Keyword -> candidate inverted index ---
+def unindexed_candidate_ids(keyword_version, limit=1000):
+    """Candidates with no stored match row for this keyword set (never scored, or scored on an older one).
+
+    Linked duplicates are skipped: only master records are scored and ranked.
+    """
+    with connection() as conn:
+        rows = conn.execute("""
+            SELECT c.id FROM candidates c
+            LEFT JOIN candidate_matches m ON m.candidate_id = c.id AND m.keyword_version = ?
+            WHERE m.candidate_id IS NULL AND c.duplicate_of IS NULL ORDER BY c.id DESC LIMIT ?
+        """, (keyword_version, int(limit))).fetchall()
+    return [r[0] for r in rows]
+
+def count_unindexed_candidates(keyword_version):
+    with connection() as conn:
+        return conn.execute("""
+            SELECT COUNT(*) FROM candidates c
+            LEFT JOIN candidate_matches m ON m.candidate_id = c.id AND m.keyword_version = ?
+            WHERE m.candidate_id IS NULL AND c.duplicate_of IS NULL
+        """, (keyword_version,)).fetchone()[0]
+
+def drop_stale_postings(keyword_version, batch_size=5000, pause=0.01):
+    """Remove postings left over from earlier keyword sets; returns rows deleted.
+
+    Other versions are found by seeking the primary key one version at a time, and each is
+    deleted in short transactions of batch_size rows, so writers get the lock in between.
+    """
+    deleted, after = 0, ""
+    while True:
+        with connection() as conn:
+            row = conn.execute("SELECT keyword_version FROM keyword_matches WHERE keyword_version > ? "
+                               "ORDER BY keyword_version LIMIT 1", (after,)).fetchone()
+        if row is None:
+            return deleted
+        after = row[0]
+        if after == keyword_version:
+            continue
+        while True:
+            with transaction() as conn:
+                n = conn.execute("""
+                    DELETE FROM keyword_matches WHERE rowid IN
+                        (SELECT rowid FROM keyword_matches WHERE keyword_version = ? LIMIT ?)
+                """, (after, int(batch_size))).rowcount
+            deleted += n
+            if n < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+def top_candidates_for_terms(keyword_version, weighted_terms, threshold, limit=10, is_test=None):
+    """Top candidates by summed weight of terms matched at >= threshold, read from keyword_matches.
+
+    weighted_terms: [(term, weight)] using the keyword index's spelling of each term.
+    """
+    if not weighted_terms:
+        return []
+    values = ", ".join("(?, ?)" for _ in weighted_terms)
+    params = [x for tw in weighted_terms for x in tw] + [keyword_version, float(threshold)]
+    test_clause = "WHERE c.duplicate_of IS NULL"
+    if is_test is not None:
+        test_clause += " AND c.is_test = ?"
+        params.append(int(is_test))
+    params.append(int(limit))
+    with connection() as conn:
+        rows = conn.execute(f"""
+            WITH q(term, weight) AS (VALUES {values}),
+            ranked AS (
+                SELECT km.candidate_id, SUM(q.weight) AS score, group_concat(q.term, ', ') AS hits
+                FROM q JOIN keyword_matches km
+                  ON km.keyword_version = ? AND km.term = q.term AND km.match >= ?
+                GROUP BY km.candidate_id
+            )
+            SELECT c.id AS candidate_id, c.name, c.email, r.score, r.hits
+            FROM ranked r JOIN candidates c ON c.id = r.candidate_id
+            {test_clause}
+            ORDER BY r.score DESC, c.id DESC LIMIT ?
+        """, params).fetchall()
+    return [dict(r) for r in rows]
+
+def top_candidates_for_campaign(keyword_version, campaign_id, tier_weights, threshold, limit=10, is_test=None):
+    """Like top_candidates_for_terms, but the terms and tiers come from campaign_keywords.
+
+    tier_weights: {tier: weight}.
+    """
+    values = ", ".join("(?, ?)" for _ in tier_weights)
+    params = [x for tw in tier_weights.items() for x in tw] + [keyword_version, float(threshold), campaign_id]
+    test_clause = "WHERE c.duplicate_of IS NULL"
+    if is_test is not None:
+        test_clause += " AND c.is_test = ?"
+        params.append(int(is_test))
+    params.append(int(limit))
+    with connection() as conn:
+        rows = conn.execute(f"""
+            WITH w(tier, weight) AS (VALUES {values}),
+            ranked AS (
+                SELECT km.candidate_id, SUM(w.weight) AS score, group_concat(k.term, ', ') AS hits
+                FROM campaign_keywords ck
+                JOIN keywords k ON k.id = ck.keyword_id
+                JOIN w ON w.tier = k.tier
+                JOIN keyword_matches km
+                  ON km.keyword_version = ? AND km.term = k.term AND km.match >= ?
+                WHERE ck.campaign_id = ?
+                GROUP BY km.candidate_id
+            )
+            SELECT c.id AS candidate_id, c.name, c.email, r.score, r.hits
+            FROM ranked r JOIN candidates c ON c.id = r.candidate_id
+            {test_clause}
+            ORDER BY r.score DESC, c.id DESC LIMIT ?
+        """, params).fetchall()
+    return [dict(r) for r in rows]
+
+def list_top_scores(keyword_version, threshold, limit=50):
+    with connection() as conn:
+        rows = _exec(conn, """
+            SELECT s.candidate_id, c.name, c.email, s.score, s.hits, s.scored_at
+            FROM candidate_scores s JOIN candidates c ON c.id = s.candidate_id
+            WHERE s.keyword_version=? AND s.threshold=?
+            ORDER BY s.score DESC, s.candidate_id DESC LIMIT ?
+        """, (keyword_version, float(threshold), int(limit))).fetchall()
+    return [{**dict(r), "hits": json.loads(r["hits"] or "[]")} for r in rows]
 
 # --- (Optional) simple keyword helpers used by scoring.py ---
-def list_keywords():
-    conn = get_conn()
-    rows = _exec(conn, "SELECT term, tier, notes FROM keywords ORDER BY tier, term").fetchall()
-    conn.close()
+# Bumped on every keyword write so scoring can tell its compiled index is stale
+# without re-querying the table on each score.
+_keyword_generation = 0
+
+def keyword_generation():
+    return _keyword_generation
+
+def _load_keywords():
+    with connection() as conn:
+        rows = _exec(conn, "SELECT term, tier, notes FROM keywords ORDER BY tier, term").fetchall()
     return [{"term": r["term"], "tier": r["tier"], "notes": r["notes"]} for r in rows]
 
-def add_keyword(term, tier=2, notes=None):
-    conn = get_conn()
-    _exec(conn, "INSERT OR IGNORE INTO keywords(term, tier, notes) VALUES(?,?,?)", (term, int(tier), notes))
-    conn.close()
+def list_keywords():
+    return _cached("keywords", _load_keywords)
 
-# Initialize on import
-init_db()
+def _keywords_changed():
+    global _keyword_generation
+    invalidate_cache("keywords")
+    _keyword_generation += 1
+
+def add_keyword(term, tier=2, notes=None):
+    with transaction() as conn:
+        _exec(conn, "INSERT OR IGNORE INTO keywords(term, tier, notes) VALUES(?,?,?)", (term, int(tier), notes))
+        _link_keyword_to_campaigns(conn, term)
+    _keywords_changed()
@@ -0,0 +1,269 @@
+# County-based Do-Not-Call.
+#
+# Applicants whose county is outside the hiring areas (the counties table) are flagged DNC
+# when they are ingested. A recruiter can override the flag either way; an override sticks
+# until cleared and is never touched by reevaluate(). Flags are advisory, not rejections.
+#
+# Locations are resolved against a lookup compiled once per county list: English names,
+# "Co."/"County" forms, Irish-language and historic names and Dublin postal districts match
+# exactly, anything else falls back to a fuzzy match over the same aliases. Only a whole
+# comma-separated part, a name after "Co."/"County", or words of the last part count, so
+# street and place names elsewhere in an address ("Queens Road, Belfast") don't. Each
+# distinct location is resolved once per compiled lookup, so flagging an upload is one pass.
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Optional
+
+from rapidfuzz import fuzz, process
+
+import audit
+import db
+
+FUZZY_CUTOFF = 85       # fuzz.ratio needed for a misspelt county ("Kildre", "Wickow")
+FUZZY_MIN_LEN = 5       # shorter words/aliases only match exactly
+MEMO_SIZE = 50_000      # distinct locations remembered per compiled lookup
+
+# Canonical county -> other spellings. Irish-language names are written without fadas;
+# locations are normalized the same way before lookup.
+COUNTY_ALIASES = {
+    "Antrim": ["aontroim"],
+    "Armagh": ["ard mhacha"],
+    "Carlow": ["ceatharlach"],
+    "Cavan": ["an cabhan", "cabhan"],
+    "Clare": ["an clar"],
+    "Cork": ["corcaigh", "cork city"],
+    "Derry": ["doire", "londonderry", "derry city"],
+    "Donegal": ["dun na ngall", "tir chonaill", "tyrconnell"],
+    "Down": ["an dun"],
+    "Dublin": ["baile atha cliath", "dublin city", "fingal", "south dublin", "dun laoghaire rathdown",
+               "dun laoghaire", "dublin 6w", "d6w"]
+              + [f"dublin {n}" for n in range(1, 25)] + [f"d{n}" for n in range(1, 25)]
+              + [f"d{n:02d}" for n in range(1, 25)],
+    "Fermanagh": ["fear manach"],
+    "Galway": ["gaillimh", "galway city"],
+    "Kerry": ["ciarrai"],
+    "Kildare": ["cill dara"],
+    "Kilkenny": ["cill chainnigh"],
+    "Laois": ["laoighis", "leix", "queens"],
+    "Leitrim": ["liatroim"],
+    "Limerick": ["luimneach", "limerick city"],
+    "Longford": ["an longfort", "longfort"],
+    "Louth": ["lu"],
+    "Mayo": ["maigh eo"],
+    "Meath": ["an mhi", "mhi"],
+    "Monaghan": ["muineachan"],
+    "Offaly": ["uibh fhaili", "kings"],
+    "Roscommon": ["ros comain"],
+    "Sligo": ["sligeach"],
+    "Tipperary": ["tiobraid arann", "tipp", "north tipperary", "south tipperary"],
+    "Tyrone": ["tir eoghain"],
+    "Waterford": ["port lairge", "waterford city"],
+    "Westmeath": ["an iarmhi", "iarmhi"],
+    "Wexford": ["loch garman"],
+    "Wicklow": ["cill mhantain"],
+}
+
+# Spellings that are also everyday words ("Queens Road", "Lu Street", "Upside Down Lane"):
+# they only count after "Co."/"County"/"Contae" or before "County".
+QUALIFIED_ONLY = {"down", "queens", "kings", "lu"}
+
+_PREFIXES = {"co", "county", "contae"}
+_SUFFIXES = {"co", "county", "ireland", "eire", "roi", "ni", "uk"}
+
+def _words(text):
+    s = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode().lower()
+    return re.findall(r"[a-z0-9]+", s.replace("'", ""))
+
+def normalize(text) -> str:
+    """Lowercase ASCII words of a location, without "Co."/"County" or a trailing country."""
+    words = _words(text)
+    while words and words[0] in _PREFIXES:
+        words.pop(0)
+    while words and words[-1] in _SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+@dataclass(frozen=True)
+class CountyRules:
+    names: tuple        # counties table as loaded, to notice changes
+    aliases: dict       # normalized spelling -> canonical county
+    qualified: dict     # QUALIFIED_ONLY spellings -> canonical county
+    choices: tuple      # aliases long enough for fuzzy matching
+    hiring: frozenset   # canonical hiring-area counties
+    memo: dict = field(default_factory=dict, compare=False, repr=False)  # location -> county
+
+def compile_rules(names) -> CountyRules:
+    """Build the lookup for a counties-table list; names that aren't Irish counties become their own area."""
+    aliases, qualified = {}, {}
+    for county, others in COUNTY_ALIASES.items():
+        for spelling in [county] + others:
+            key = normalize(spelling)
+            (qualified if key in QUALIFIED_ONLY else aliases)[key] = county
+    hiring = set()
+    for name in names:
+        key = normalize(name)
+        if key:
+            hiring.add(qualified.get(key) or aliases.setdefault(key, name.strip()))
+    choices = tuple(a for a in aliases if len(a) >= FUZZY_MIN_LEN)
+    return CountyRules(names=tuple(names), aliases=aliases, qualified=qualified, choices=choices,
+                       hiring=frozenset(hiring))
+
+# Process-wide compiled rules, rebuilt when the (cached) counties list changes.
+_rules = None
+_rules_lock = threading.Lock()
+
+def current_rules() -> CountyRules:
+    global _rules
+    names = tuple(db.get_counties())
+    r = _rules
+    if r is None or r.names != names:
+        with _rules_lock:
+            if _rules is None or _rules.names != names:
+                _rules = compile_rules(names)
+            r = _rules
+    return r
+
+# --- Resolution ---
+def _after_qualifier(rules, words):
+    """County named right after "Co."/"County"/"Contae" (or right before "County")."""
+    for i, w in enumerate(words):
+        if w not in _PREFIXES:
+            continue
+        for n in (3, 2, 1):
+            after = " ".join(words[i + 1:i + 1 + n])
+            hit = rules.aliases.get(after) or rules.qualified.get(after)
+            if hit:
+                return hit
+        if w == "county" and i:
+            hit = rules.aliases.get(words[i - 1]) or rules.qualified.get(words[i - 1])
+            if hit:
+                return hit
+    return None
+
+def _lookup(rules, text):
+    parts = [p for p in (normalize(p) for p in re.split(r"[,;/\n]", text)) if p]
+    if not parts:
+        return None
+    # A whole part that is a county ("Naas, Co. Kildare"), right to left.
+    for part in reversed(parts):
+        if part in rules.aliases:
+            return rules.aliases[part]
+    hit = _after_qualifier(rules, _words(text))
+    if hit:
+        return hit
+    # Word n-grams, then fuzzy, within the last part only ("Naas Co Kildare", "D15 XY12", "Kildre").
+    words = parts[-1].split()
+    for n in (3, 2, 1):
+        for i in range(len(words) - n, -1, -1):
+            hit = rules.aliases.get(" ".join(words[i:i + n]))
+            if hit:
+                return hit
+    for candidate in [parts[-1]] + list(reversed(words)):
+        if len(candidate) >= FUZZY_MIN_LEN:
+            best = process.extractOne(candidate, rules.choices, scorer=fuzz.ratio, score_cutoff=FUZZY_CUTOFF)
+            if best:
+                return rules.aliases[best[0]]
+    return None
+
+def resolve(location, rules: CountyRules = None) -> Optional[str]:
+    """Canonical county (or custom hiring area) named by a free-text location, or None."""
+    if not location or not str(location).strip():
+        return None
+    rules = rules or current_rules()
+    text = str(location)
+    if text not in rules.memo:
+        if len(rules.memo) >= MEMO_SIZE:
+            rules.memo.clear()
+        rules.memo[text] = _lookup(rules, text)
+    return rules.memo[text]
+
+def evaluate(location, rules: CountyRules = None):
+    """(location, county, dnc, dnc_reason) for insert_candidates.
+
+    Only a recognised county outside the hiring areas is flagged: a blank or unrecognised
+    location, or no hiring areas configured at all, leaves the candidate callable.
+    """
+    if not location or not str(location).strip():
+        return db.NO_DNC
+    rules = rules or current_rules()
+    location = str(location).strip()
+    county = resolve(location, rules)
+    if county is None or not rules.hiring or county in rules.hiring:
+        return (location, county, 0, None)
+    return (location, county, 1, f"Outside hiring areas ({county})")
+
+def evaluate_many(locations):
+    """evaluate() for a batch against one compiled lookup."""
+    rules = current_rules()
+    return [evaluate(loc, rules) for loc in locations]
+
+# --- Stored flags ---
+def reevaluate(batch_size: int = 5000, progress=None) -> int:
+    """Re-apply the current hiring areas to every candidate without an override; returns rows changed.
+
+    Walks candidates in id order, one transaction per batch, and only writes rows whose
+    county or flag actually changes.
+    """
+    rules = current_rules()
+    last_id, changed, seen = 0, 0, 0
+    while True:
+        with db.transaction() as conn:
+            rows = conn.execute("""
+                SELECT id, location, county, dnc, dnc_reason FROM candidates
+                WHERE id > ? AND dnc_override IS NULL AND location IS NOT NULL ORDER BY id LIMIT ?
+            """, (last_id, int(batch_size))).fetchall()
+            if not rows:
+                break
+            updates = []
+            for r in rows:
+                _, county, flag, reason = evaluate(r["location"], rules)
+                if (county, flag, reason) != (r["county"], r["dnc"], r["dnc_reason"]):
+                    updates.append((county, flag, reason, r["id"]))
+            conn.executemany("UPDATE candidates SET county = ?, dnc = ?, dnc_reason = ? WHERE id = ?", updates)
+        last_id = rows[-1]["id"]
+        changed += len(updates)
+        seen += len(rows)
+        if progress:
+            progress({"rows": seen, "changed": changed, "last_id": last_id})
+    audit.record("dnc_reevaluate", changed=changed, hiring_areas=sorted(rules.hiring))
+    return changed
+
+def set_override(candidate_id: int, dnc: Optional[bool], reason: str = None):
+    """Mark a candidate DNC (True) or callable (False) by hand, or return it to automatic (None)."""
+    with db.transaction() as conn:
+        row = conn.execute("SELECT location FROM candidates WHERE id = ?", (int(candidate_id),)).fetchone()
+        if row is None:
+            raise ValueError(f"No candidate #{candidate_id}")
+        if dnc is None:
+            _, county, flag, why = evaluate(row["location"])
+            conn.execute("UPDATE candidates SET dnc_override = NULL, county = coalesce(?, county), dnc = ?, "
+                         "dnc_reason = ? WHERE id = ?", (county, flag, why, int(candidate_id)))
+        else:
+            why = (reason or "").strip() or ("Do not call" if dnc else "Cleared")
+            conn.execute("UPDATE candidates SET dnc_override = ?, dnc = ?, dnc_reason = ? WHERE id = ?",
+                         (int(dnc), int(dnc), f"Manual: {why}", int(candidate_id)))
+    audit.record("dnc_override", candidate_id=int(candidate_id), dnc=dnc, reason=reason)
+
+def flagged(limit: int = 200, before_id: int = None, overrides_only: bool = False):
+    """Newest-first DNC candidates (or every manual override); pass the last id as before_id for more."""
+    where = "dnc_override IS NOT NULL" if overrides_only else "dnc = 1"
+    params = []
+    if before_id is not None:
+        where += " AND id < ?"
+        params.append(int(before_id))
+    params.append(int(limit))
+    with db.connection() as conn:
+        rows = conn.execute(f"""
+            SELECT id, name, location, county, dnc, dnc_reason, dnc_override FROM candidates
+            WHERE {where} ORDER BY id DESC LIMIT ?
+        """, params).fetchall()
+    return [dict(r) for r in rows]
+
+def counts() -> dict:
+    with db.connection() as conn:
+        return {
+            "dnc": conn.execute("SELECT COUNT(*) FROM candidates WHERE dnc = 1").fetchone()[0],
+            "overrides": conn.execute("SELECT COUNT(*) FROM candidates WHERE dnc_override IS NOT NULL").fetchone()[0],
+        }
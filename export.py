@@ -0,0 +1,85 @@
+# Streaming export of candidates with their assessments, interviews and stored keyword score.
+#
+# Rows come from db.iter_export_rows in cursor batches and are written as they arrive, so
+# memory stays at one batch whatever the table size. Parquet needs pyarrow (optional);
+# CSV always works.
+import csv
+import io
+import json
+import os
+
+from db import EXPORT_COLUMNS, iter_export_rows
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+FORMATS = ("csv", "parquet") if pa is not None else ("csv",)
+
+def parquet_available() -> bool:
+    return pa is not None
+
+def _readable_hits(rows):
+    """Replace the stored hits JSON with a "Term, Term" list (column 'keyword_hits')."""
+    j = EXPORT_COLUMNS.index("keyword_hits")
+    for r in rows:
+        if r[j]:
+            r = r[:j] + (", ".join(h["term"] for h in json.loads(r[j])),) + r[j + 1:]
+        yield r
+
+def _batches(is_test, date_from, date_to, threshold, batch_size):
+    import scoring  # only for the current keyword-set version of the stored scores
+    for rows in iter_export_rows(is_test=is_test, date_from=date_from, date_to=date_to,
+                                 keyword_version=scoring.keyword_version(), threshold=threshold,
+                                 batch_size=batch_size):
+        yield list(_readable_hits(rows))
+
+def _write_csv(f, batches):
+    text = io.TextIOWrapper(f, encoding="utf-8", newline="", write_through=True)
+    try:
+        w = csv.writer(text)
+        w.writerow(EXPORT_COLUMNS)
+        n = 0
+        for rows in batches:
+            w.writerows(rows)
+            n += len(rows)
+        return n
+    finally:
+        text.detach()  # leave the caller's file open
+
+PARQUET_TYPES = {
+    "id": "int64", "duplicate_of": "int64", "is_test": "int64", "assessments": "int64", "interviews": "int64",
+    "best_assessment_score": "float64", "latest_assessment_score": "float64", "keyword_score": "float64",
+}
+
+def _write_parquet(f, batches):
+    schema = pa.schema([(c, getattr(pa, PARQUET_TYPES.get(c, "string"))()) for c in EXPORT_COLUMNS])
+    n = 0
+    with pq.ParquetWriter(f, schema, compression="zstd") as writer:
+        for rows in batches:
+            # One row group per batch.
+            cols = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays([pa.array(c, type=t.type) for c, t in zip(cols, schema)],
+                                                    schema=schema))
+            n += len(rows)
+        if n == 0:
+            writer.write_table(schema.empty_table())
+    return n
+
+def export_candidates(out, fmt: str = "csv", is_test=None, date_from=None, date_to=None,
+                      threshold: int = 85, batch_size: int = 5000) -> int:
+    """Stream the candidate export to `out` (a path or a binary file); returns rows written.
+
+    is_test: None for everything, 0/False for live data only, 1/True for test data only.
+    date_from/date_to are inclusive ISO dates on the candidate's created_at.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format {fmt!r}; available: {', '.join(FORMATS)}")
+    write = _write_parquet if fmt == "parquet" else _write_csv
+    batches = _batches(is_test, date_from, date_to, threshold, batch_size)
+    if isinstance(out, (str, os.PathLike)):
+        with open(out, "wb") as f:
+            return write(f, batches)
+    return write(out, batches)
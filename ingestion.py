@@ -1,67 +1,320 @@
+import os
+import time
+import hashlib
 import pandas as pd
+from collections import defaultdict
+from datetime import datetime
+from rapidfuzz import fuzz
 from typing import Optional
-from db import add_candidate, add_test_score, add_interview_note, find_candidate_by_email, get_connection, _exec
+from instrumentation import traced
+import audit
+import dnc
+from db import (transaction, resolve_candidate_emails, insert_candidates, insert_test_scores,
+                insert_interview_notes, find_open_ingest_job, start_ingest_job, advance_ingest_job,
+                finish_ingest_job, identity_keys, name_tokens, candidates_sharing_keys, set_duplicate_links,
+                replace_stub_masters, stubs_masking_applications, candidate_identity_rows)
 
-def ingest_applications(df: pd.DataFrame, is_test: bool = False):
-    expected_cols = {"name","email","phone","source","resume_text","notes"}
-    # Attempt to normalize columns
+APPLICATION_COLUMNS = ["name", "email", "phone", "source", "resume_text", "notes"]
+LOCATION_COLUMNS = ["county", "location", "address"]  # first one present feeds the DNC check
+
+def _application_rows(df: pd.DataFrame, is_test: bool = False):
+    """Map an applications frame to candidate insert tuples without iterating rows in Python."""
+    # Column headers match case-insensitively and ignoring surrounding whitespace.
+    df_cols = {c.strip().lower(): c for c in df.columns}
+    out = pd.DataFrame(index=df.index)
+    for name in APPLICATION_COLUMNS:
+        src = df_cols.get(name)
+        out[name] = df[src] if src is not None else None
+    out = out.astype(object).where(out.notna(), None)
+    out["is_test"] = int(is_test)
+    out["created_at"] = datetime.utcnow().isoformat()
+    return list(out.itertuples(index=False, name=None))
+
+def _application_locations(df: pd.DataFrame):
+    """Per-row location text from the first LOCATION_COLUMNS header present (matched like above)."""
     df_cols = {c.strip().lower(): c for c in df.columns}
-    def col(name): return df_cols.get(name, None)
-    created = 0
-    for _, row in df.iterrows():
-        name = row.get(col("name")) if col("name") else row.get("name")
-        email = row.get(col("email")) if col("email") else row.get("email")
-        phone = row.get(col("phone")) if col("phone") else row.get("phone")
-        source = row.get(col("source")) if col("source") else row.get("source")
-        resume_text = row.get(col("resume_text")) if col("resume_text") else row.get("resume_text")
-        notes = row.get(col("notes")) if col("notes") else row.get("notes")
-        add_candidate(name=name, email=email, phone=phone, source=source, resume_text=resume_text, notes=notes, is_test=int(is_test))
-        created += 1
-    return created
+    src = next((df_cols[c] for c in LOCATION_COLUMNS if c in df_cols), None)
+    if src is None:
+        return [None] * len(df)
+    return [v if isinstance(v, str) and v.strip() else None for v in df[src].tolist()]
+
+@traced("ingest")
+def bulk_ingest_applications(df: pd.DataFrame, is_test: bool = False, batch_size: int = 5000):
+    """Insert every application row with executemany, one transaction per batch; returns new ids.
+
+    Each batch goes through link_duplicates, so repeat applicants are linked to their
+    earlier record in the same transaction. County DNC flags are evaluated for the whole
+    frame up front and stored with the insert.
+    """
+    rows = _application_rows(df, is_test)
+    flags = dnc.evaluate_many(_application_locations(df))
+    ids = []
+    for i in range(0, len(rows), batch_size):
+        with transaction() as conn:
+            ids.extend(_insert_and_link(conn, rows[i:i + batch_size], flags[i:i + batch_size]))
+    audit.record("ingest", kind="applications", rows=len(ids), is_test=bool(is_test),
+                 first_id=ids[0] if ids else None, last_id=ids[-1] if ids else None,
+                 dnc=sum(f[2] for f in flags))
+    return ids
+
+@traced("ingest")
+def ingest_applications(df: pd.DataFrame, is_test: bool = False):
+    return len(bulk_ingest_applications(df, is_test=is_test))
+
+def _write_applications(conn, df: pd.DataFrame, is_test: bool = False):
+    return len(_insert_and_link(conn, _application_rows(df, is_test), dnc.evaluate_many(_application_locations(df))))
+
+def _insert_and_link(conn, rows, flags=None):
+    ids = insert_candidates(conn, rows, flags)
+    link_duplicates(conn, [dict(zip(("email_norm", "phone_digits", "name_key"), identity_keys(r[0], r[1], r[2])),
+                                id=cid, name=r[0], duplicate_of=None, bare=r[0] is None and r[4] is None)
+                           for cid, r in zip(ids, rows)])
+    return ids
+
+# --- Entity resolution ---
+# Candidates are only compared within blocks that share an indexed key, so the work grows
+# with block size rather than with the table. A pair is confirmed when:
+#   same email_norm     and names agree (or one side has no name; shared family emails
+#                       with different first names stay separate),
+#   same phone_digits   and names agree closely,
+#   same name_key       and names agree closely and the phone's last 7 digits or the
+#                       canonical email (no dots/+tag in the local part) agree.
+# When the earlier master is a bare stub left by an assessment/interview import, the new
+# record takes its place as master instead, so the application stays visible and scored.
+NAME_MATCH_EMAIL = 80
+NAME_MATCH_STRICT = 85
+
+def _name_similarity(a, b) -> float:
+    """Weaker of the first-name and surname similarities, so relatives sharing a surname don't match."""
+    ta, tb = name_tokens(a), name_tokens(b)
+    if not ta or not tb:
+        return 0.0
+    if len(ta) == 1 or len(tb) == 1:
+        return fuzz.ratio(" ".join(ta), " ".join(tb))
+    return min(fuzz.ratio(ta[0], tb[0]), fuzz.ratio(ta[-1], tb[-1]))
+
+def _canonical_email(email):
+    if not email or "@" not in email:
+        return None
+    local, domain = email.rsplit("@", 1)
+    return local.split("+", 1)[0].replace(".", "") + "@" + domain
+
+def _soft_keys(rec):
+    """Name-block keys: (name_key, phone tail) and (name_key, canonical email)."""
+    keys = []
+    if rec["name_key"]:
+        if rec["phone_digits"]:
+            keys.append(("phone7", rec["name_key"], rec["phone_digits"][-7:]))
+        if rec["email_norm"]:
+            keys.append(("email", rec["name_key"], _canonical_email(rec["email_norm"])))
+    return keys
+
+def _confirmed(new, old) -> bool:
+    if new["email_norm"] and new["email_norm"] == old["email_norm"]:
+        return not new["name"] or not old["name"] or _name_similarity(new["name"], old["name"]) >= NAME_MATCH_EMAIL
+    if not new["name"] or not old["name"]:
+        return False
+    return _name_similarity(new["name"], old["name"]) >= NAME_MATCH_STRICT
 
+def link_duplicates(conn, records) -> int:
+    """Link each record to the master of the earliest earlier candidate it duplicates.
+
+    records: identity dicts (id, name, email_norm, phone_digits, name_key, duplicate_of, bare),
+    already inserted, in id order. Runs on `conn` inside transaction(); returns links made.
+    """
+    records = [r for r in records if r["duplicate_of"] is None]
+    if not records:
+        return 0
+    pool = candidates_sharing_keys(conn, emails=[r["email_norm"] for r in records],
+                                   phones=[r["phone_digits"] for r in records],
+                                   name_keys=[r["name_key"] for r in records])
+    blocks = defaultdict(list)
+    for r in sorted(pool.values(), key=lambda r: r["id"]):
+        if r["email_norm"]:
+            blocks[("email_norm", r["email_norm"])].append(r["id"])
+        if r["phone_digits"]:
+            blocks[("phone", r["phone_digits"])].append(r["id"])
+        for key in _soft_keys(r):
+            blocks[key].append(r["id"])
+    master = {r["id"]: r["duplicate_of"] or r["id"] for r in pool.values()}
+    links, promoted = [], []
+    for rec in records:
+        keys = [("email_norm", rec["email_norm"]), ("phone", rec["phone_digits"])] + _soft_keys(rec)
+        earlier = sorted({cid for key in keys if key[-1] for cid in blocks.get(key, ()) if cid < rec["id"]})
+        for cid in earlier:
+            if _confirmed(rec, pool[cid]):
+                m = master[cid]
+                if m == rec["id"]:
+                    pass  # already the master of this block
+                elif not rec["bare"] and m in pool and pool[m]["bare"]:
+                    for k, v in master.items():
+                        if v == m:
+                            master[k] = rec["id"]
+                    promoted.append((m, rec["id"]))
+                else:
+                    master[rec["id"]] = m
+                    links.append((rec["id"], m))
+                break
+    set_duplicate_links(conn, links)
+    replace_stub_masters(conn, promoted)
+    return len(links) + len(promoted)
+
+def resolve_existing_duplicates(batch_size: int = 5000, progress=None) -> int:
+    """Run link_duplicates over every unlinked candidate in id order; returns links made.
+
+    One transaction per batch, so it can be stopped and re-run; already-linked rows are skipped.
+    Applications linked under a bare stub by earlier runs are made masters first.
+    """
+    with transaction() as conn:
+        promoted = stubs_masking_applications(conn)
+        replace_stub_masters(conn, promoted)
+    after, linked = 0, len(promoted)
+    while True:
+        with transaction() as conn:
+            batch = candidate_identity_rows(conn, after_id=after, limit=batch_size)
+            if not batch:
+                break
+            linked += link_duplicates(conn, batch)
+        after = batch[-1]["id"]
+        if progress:
+            progress({"last_id": after, "linked": linked})
+    audit.record("dedupe_existing", linked=linked)
+    return linked
+
+def _clean(series: pd.Series) -> pd.Series:
+    return series.astype(object).where(series.notna(), None)
+
+def _emails(series: pd.Series) -> pd.Series:
+    """Lowercased, stripped emails; blanks become None."""
+    out = series.where(series.notna(), "").astype(str).str.strip().str.lower()
+    return out.where(out != "", None)
+
+def _to_float(value):
+    try:
+        return float(value) if value is not None and str(value).strip() != "" else None
+    except Exception:
+        return None
+
+@traced("ingest")
 def ingest_testgorilla(df: pd.DataFrame, is_test: bool = False):
+    with transaction() as conn:
+        n = _write_testgorilla(conn, df, is_test)
+    audit.record("ingest", kind="testgorilla", rows=n, is_test=bool(is_test))
+    return n
+
+def _write_testgorilla(conn, df: pd.DataFrame, is_test: bool = False):
     # Expect columns: email, score (or assessment_score)
     df_cols = {c.strip().lower(): c for c in df.columns}
     email_col = df_cols.get("email")
     score_col = df_cols.get("score", df_cols.get("assessment_score"))
-    count = 0
-    for _, row in df.iterrows():
-        email = row.get(email_col) if email_col else None
-        score = row.get(score_col) if score_col else None
-        if not email:
-            continue
-        cand = find_candidate_by_email(str(email).strip().lower())
-        if not cand:
-            # create bare candidate
-            cid = add_candidate(name=None, email=str(email).strip().lower(), is_test=int(is_test))
-        else:
-            cid = cand["id"]
-        try:
-            sc = float(score) if score is not None and str(score).strip() != "" else None
-        except Exception:
-            sc = None
-        add_test_score(cid, source="TestGorilla", score=sc, is_test=int(is_test))
-        count += 1
-    return count
+    if not email_col:
+        return 0
+    frame = pd.DataFrame({
+        "email": _emails(df[email_col]),
+        "score": _clean(df[score_col]).map(_to_float) if score_col else None,
+    }).dropna(subset=["email"])
+    if frame.empty:
+        return 0
+    now = datetime.utcnow().isoformat()
+    # Unknown emails become bare candidates, created in the same transaction.
+    ids = resolve_candidate_emails(conn, frame["email"], is_test=int(is_test))
+    insert_test_scores(conn, [(ids[e], "TestGorilla", sc, None, now, int(is_test))
+                              for e, sc in zip(frame["email"], _clean(frame["score"]))])
+    return len(frame)
 
+@traced("ingest")
 def ingest_interview_notes(df: pd.DataFrame, is_test: bool = False):
+    with transaction() as conn:
+        n = _write_interview_notes(conn, df, is_test)
+    audit.record("ingest", kind="interview_notes", rows=n, is_test=bool(is_test))
+    return n
+
+def _write_interview_notes(conn, df: pd.DataFrame, is_test: bool = False):
     # Expect columns: email, notes, date (optional)
     df_cols = {c.strip().lower(): c for c in df.columns}
     email_col = df_cols.get("email")
     notes_col = df_cols.get("notes")
     date_col = df_cols.get("date")
-    count = 0
-    for _, row in df.iterrows():
-        email = row.get(email_col) if email_col else None
-        notes = row.get(notes_col) if notes_col else None
-        date = row.get(date_col) if date_col else None
-        if not email or not notes:
-            continue
-        cand = find_candidate_by_email(str(email).strip().lower())
-        if not cand:
-            cid = add_candidate(name=None, email=str(email).strip().lower(), is_test=int(is_test))
-        else:
-            cid = cand["id"]
-        add_interview_note(cid, notes=notes, date=date, is_test=int(is_test))
-        count += 1
-    return count
\ No newline at end of file
+    if not email_col or not notes_col:
+        return 0
+    notes = _clean(df[notes_col])
+    frame = pd.DataFrame({
+        "email": _emails(df[email_col]),
+        "notes": notes.where(notes.astype(str).str.strip() != "", None),
+        "date": _clean(df[date_col]) if date_col else None,
+    }).dropna(subset=["email", "notes"])
+    if frame.empty:
+        return 0
+    now = datetime.utcnow().isoformat()
+    ids = resolve_candidate_emails(conn, frame["email"], is_test=int(is_test))
+    insert_interview_notes(conn, [(ids[e], n, d, now, int(is_test))
+                                  for e, n, d in zip(frame["email"], frame["notes"], _clean(frame["date"]))])
+    return len(frame)
+
+# --- Streaming CSV ingest ---
+# Chunk writers run on the chunk's transaction and return how many rows they stored.
+CHUNK_WRITERS = {
+    "applications": _write_applications,
+    "testgorilla": _write_testgorilla,
+    "interview_notes": _write_interview_notes,
+}
+
+def file_fingerprint(f, kind: str) -> str:
+    """Identify an upload by kind, size and its first MiB, so a re-upload can resume."""
+    pos = f.tell()
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    f.seek(0)
+    head = f.read(1 << 20)
+    f.seek(pos)
+    digest = hashlib.sha1(f"{kind}:{size}:".encode("utf-8"))
+    digest.update(head if isinstance(head, bytes) else head.encode("utf-8"))
+    return digest.hexdigest()
+
+@traced("ingest")
+def ingest_csv_stream(source, kind: str, is_test: bool = False, chunksize: int = 10000,
+                      progress=None, resume: bool = True):
+    """Ingest a CSV of `kind` chunk by chunk with bounded memory; returns rows stored.
+
+    `source` is a path or a seekable binary file (e.g. a Streamlit upload). Each chunk
+    commits together with its ingest_jobs checkpoint, so if the session dies a rerun
+    over the same file skips the committed chunks and continues. `progress`, if given,
+    is called after each chunk with rows/chunks done, rows_per_sec and fraction read.
+    """
+    write = CHUNK_WRITERS[kind]
+    f = open(source, "rb") if isinstance(source, (str, os.PathLike)) else source
+    try:
+        fingerprint = file_fingerprint(f, kind)
+        job = find_open_ingest_job(fingerprint, kind, is_test) if resume else None
+        if job is None:
+            job = start_ingest_job(fingerprint, kind, chunksize, is_test)
+        skip, rows_done = job["chunks_done"], job["rows_done"]
+        f.seek(0, os.SEEK_END)
+        size = f.tell() or 1
+        f.seek(0)
+
+        started = time.perf_counter()
+        rows_read = 0
+        for n, chunk in enumerate(pd.read_csv(f, chunksize=job["chunksize"])):
+            if n < skip:
+                continue
+            with transaction() as conn:
+                stored = write(conn, chunk, is_test)
+                advance_ingest_job(conn, job["id"], stored)
+            rows_done += stored
+            rows_read += len(chunk)
+            if progress:
+                elapsed = time.perf_counter() - started
+                progress({
+                    "rows": rows_done,
+                    "chunks": n + 1,
+                    "rows_per_sec": rows_read / elapsed if elapsed else 0.0,
+                    "fraction": min(f.tell() / size, 1.0),
+                })
+        finish_ingest_job(job["id"])
+        audit.record("ingest", kind=kind, rows=rows_done, is_test=bool(is_test), streamed=True,
+                     job_id=job["id"], resumed_from_chunk=skip)
+        return rows_done
+    finally:
+        if f is not source:
+            f.close()
@@ -0,0 +1,184 @@
+# Opt-in timing for SQL statements, pages and ingest/score calls.
+#
+# Off by default; enable with PULSEHIRE_INSTRUMENT=1 or instrumentation.enable() (then
+# db.configure() so pooled connections are reopened with the timing class). Each timed
+# name keeps a rolling window of recent durations for percentiles; statements slower than
+# SLOW_MS also go to a bounded slow-query log. Only parameter counts are kept, never
+# values, so the log holds no candidate data.
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, wraps
+
+ENABLED = os.environ.get("PULSEHIRE_INSTRUMENT", "").lower() in ("1", "true", "yes")
+SLOW_MS = float(os.environ.get("PULSEHIRE_SLOW_MS", "100"))
+WINDOW = 500            # recent samples kept per name for percentiles
+SLOW_LOG_SIZE = 200
+
+_lock = threading.Lock()
+_series = {}            # (kind, name) -> {"count", "total_ms", "max_ms", "recent": deque}
+_slow = deque(maxlen=SLOW_LOG_SIZE)
+
+def enable(slow_ms: float = None):
+    global ENABLED, SLOW_MS
+    ENABLED = True
+    if slow_ms is not None:
+        SLOW_MS = float(slow_ms)
+
+def set_slow_ms(slow_ms: float):
+    global SLOW_MS
+    SLOW_MS = float(slow_ms)
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    with _lock:
+        _series.clear()
+        _slow.clear()
+
+# --- Recording ---
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"\(\?…\)(?:\s*,\s*\(\?…\))+")
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace, literals and IN/VALUES lists so one query shape is one name."""
+    s = " ".join(sql.split())
+    s = _LITERALS.sub("?", s)
+    s = _LISTS.sub("(?…)", s)
+    s = _ROWS.sub("(?…), …", s)
+    return s[:300]
+
+def record(kind: str, name: str, ms: float):
+    with _lock:
+        s = _series.get((kind, name))
+        if s is None:
+            s = _series[(kind, name)] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "recent": deque(maxlen=WINDOW)}
+        s["count"] += 1
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+        s["recent"].append(ms)
+
+def _record_sql(sql, ms, params=0, rows=None):
+    name = normalize_sql(sql)
+    record("sql", name, ms)
+    if ms >= SLOW_MS:
+        entry = {"at": datetime.utcnow().isoformat(timespec="seconds"), "ms": round(ms, 2),
+                 "sql": name, "params": params, "thread": threading.current_thread().name}
+        if rows is not None:
+            entry["rows"] = rows
+        with _lock:
+            _slow.append(entry)
+
+@contextmanager
+def timed(kind: str, name: str):
+    """Time the block under (kind, name) when enabled."""
+    if not ENABLED:
+        yield
+        return
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(kind, name, (time.perf_counter() - t) * 1000)
+
+def traced(kind: str, name: str = None):
+    """Decorator form of timed(); a single flag check when disabled."""
+    def deco(fn):
+        label = name or fn.__name__
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(kind, label, (time.perf_counter() - t) * 1000)
+        return wrapper
+    return deco
+
+# --- SQLite layer ---
+def _nparams(params):
+    try:
+        return len(params)
+    except TypeError:
+        return 0
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        t = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            _record_sql(sql, (time.perf_counter() - t) * 1000, _nparams(params))
+
+    def executemany(self, sql, seq_of_params):
+        # Materialised so the row count can be logged; callers already pass lists or generators of tuples.
+        seq_of_params = list(seq_of_params)
+        t = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_params)
+        finally:
+            first = seq_of_params[0] if seq_of_params else ()
+            _record_sql(sql, (time.perf_counter() - t) * 1000, _nparams(first), rows=len(seq_of_params))
+
+    def executescript(self, script):
+        t = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            _record_sql(script, (time.perf_counter() - t) * 1000)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection whose execute* calls are timed through InstrumentedCursor."""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+def connection_factory():
+    """Connection class for sqlite3.connect(factory=...): timed when enabled."""
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+# --- Reporting ---
+def _pct(sorted_ms, q):
+    if not sorted_ms:
+        return None
+    return sorted_ms[min(len(sorted_ms) - 1, int(round(q * (len(sorted_ms) - 1))))]
+
+def summary(kind: str = None):
+    """[{kind, name, count, total_ms, p50_ms, p95_ms, p99_ms, max_ms}], slowest total first.
+
+    Percentiles cover the last WINDOW samples; count/total/max cover the whole process.
+    """
+    with _lock:
+        items = [(k, dict(v, recent=sorted(v["recent"]))) for k, v in _series.items() if kind in (None, k[0])]
+    out = []
+    for (k, name), s in items:
+        out.append({
+            "kind": k, "name": name, "count": s["count"], "total_ms": round(s["total_ms"], 2),
+            "p50_ms": round(_pct(s["recent"], 0.50), 2), "p95_ms": round(_pct(s["recent"], 0.95), 2),
+            "p99_ms": round(_pct(s["recent"], 0.99), 2), "max_ms": round(s["max_ms"], 2),
+        })
+    return sorted(out, key=lambda r: r["total_ms"], reverse=True)
+
+def slow_queries():
+    """Newest-first slow statements: {at, ms, sql, params, thread[, rows]}."""
+    with _lock:
+        return list(reversed(_slow))
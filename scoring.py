@@ -1,6 +1,16 @@
 from rapidfuzz import fuzz, process
+import numpy as np
 import re
-from db import list_keywords, add_keyword
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from instrumentation import traced
+import audit
+from db import (list_keywords, add_keyword, keyword_generation, get_resume_texts,
+                get_candidate_scores, save_candidate_scores,
+                get_candidate_matches, save_candidate_matches, unindexed_candidate_ids,
+                count_unindexed_candidates, drop_stale_postings, top_candidates_for_terms,
+                top_candidates_for_campaign, campaign_missing_terms, split_keywords)
 
 DEFAULT_KEYWORDS = [
     {"term":"Customer Service", "tier":1, "notes":"Core competency"},
@@ -48,31 +58,339 @@ DEFAULT_KEYWORDS = [
 
 TIER_WEIGHTS = {1: 3.0, 2: 2.0, 3: 1.0}
 
+# Similarities at or above this go into the keyword -> candidate index (keyword_matches);
+# it matches the lowest value the scoring page's threshold slider allows.
+INDEX_FLOOR = 70
+
 def normalize_text(text: str) -> str:
     text = text or ""
     text = text.lower()
     text = re.sub(r"[\W_]+", " ", text, flags=re.UNICODE)
     return text
 
+@dataclass(frozen=True)
+class KeywordIndex:
+    terms: tuple      # original spelling, for display
+    lowered: tuple    # what partial_ratio is run against
+    tiers: tuple
+    weights: tuple
+    version: str      # content hash of the (term, tier) set
+    generation: int   # db.keyword_generation() the index was built at
+    bigrams: tuple    # per term: its character bigrams, one per position
+    bounds: tuple     # per term: best possible partial_ratio given G shared bigrams
+    min_shared: dict = field(default_factory=dict, compare=False, repr=False)  # threshold -> per-term G needed
+
+# Process-wide compiled index, shared by every Streamlit session.
+_index = None
+_index_lock = threading.Lock()
+
+def _ratio_bounds(m: int) -> tuple:
+    """Upper bound on partial_ratio(term, text) for a term of length m, indexed by G.
+
+    G counts the term's bigram positions whose bigram occurs anywhere in the text.
+    For any text window of length k, an LCS of length L has at most G "tight"
+    neighbour pairs and every other pair skips a character on one side, so
+    3L <= m + k + 1 + G; the ratio 200L / (m + k) is maximised over k <= m.
+    Only valid when the text is at least as long as the term.
+    """
+    bounds = []
+    for g in range(max(m - 1, 0) + 1):
+        best = 0.0
+        for k in range(1, m + 1):
+            lcs = min(k, m, (m + k + 1 + g) // 3)
+            best = max(best, 200.0 * lcs / (m + k))
+        bounds.append(best)
+    return tuple(bounds)
+
+def _compile_index(kws, generation: int) -> KeywordIndex:
+    terms = tuple(k["term"] for k in kws)
+    tiers = tuple(int(k["tier"]) for k in kws)
+    digest = hashlib.sha1()
+    for term, tier in sorted(zip(terms, tiers)):
+        digest.update(f"{term}\t{tier}\n".encode("utf-8"))
+    lowered = tuple(t.lower() for t in terms)
+    return KeywordIndex(
+        terms=terms,
+        lowered=lowered,
+        tiers=tiers,
+        weights=tuple(TIER_WEIGHTS.get(t, 1.0) for t in tiers),
+        version=digest.hexdigest()[:16],
+        generation=generation,
+        bigrams=tuple(tuple(t[i:i + 2] for i in range(len(t) - 1)) for t in lowered),
+        bounds=tuple(_ratio_bounds(len(t)) for t in lowered),
+    )
+
+def get_keyword_index() -> KeywordIndex:
+    """Return the compiled keyword index, rebuilding it only after a keyword write."""
+    global _index
+    gen = keyword_generation()
+    idx = _index
+    if idx is not None and idx.generation == gen:
+        return idx
+    with _index_lock:
+        idx = _index
+        if idx is None or idx.generation != gen:
+            idx = _compile_index(list_keywords(), gen)
+            _index = idx
+    return idx
+
+def keyword_version() -> str:
+    return get_keyword_index().version
+
 def build_keyword_index():
-    kws = list_keywords()
-    return [(k["term"], int(k["tier"])) for k in kws]
+    idx = get_keyword_index()
+    return list(zip(idx.terms, idx.tiers))
 
+# How often the prefilter in score_text settled a term without partial_ratio.
+_prefilter_stats = {"exact": 0, "pruned": 0, "fuzzy": 0}
+_stats_lock = threading.Lock()
+
+def prefilter_stats() -> dict:
+    """Counts since start/reset: exact hits, pruned terms, and fuzzy calls actually made."""
+    with _stats_lock:
+        return dict(_prefilter_stats)
+
+def reset_prefilter_stats():
+    with _stats_lock:
+        for k in _prefilter_stats:
+            _prefilter_stats[k] = 0
+
+def _min_shared(idx: KeywordIndex, threshold) -> tuple:
+    """Per term, the fewest shared bigrams that could still reach `threshold` (None = never)."""
+    need = idx.min_shared.get(threshold)
+    if need is None:
+        need = tuple(next((g for g, b in enumerate(bounds) if b >= threshold), None)
+                     for bounds in idx.bounds)
+        idx.min_shared[threshold] = need
+    return need
+
+def _may_reach(bigrams, need, txt) -> bool:
+    """True unless fewer than `need` of the term's bigrams can occur in txt."""
+    if need is None:
+        return False
+    allowed_missing = len(bigrams) - need
+    found = missing = 0
+    for bg in bigrams:
+        if bg in txt:
+            found += 1
+            if found >= need:
+                return True
+        else:
+            missing += 1
+            if missing > allowed_missing:
+                return False
+    return found >= need
+
+@traced("score")
 def score_text(text: str, threshold: int = 85):
     txt = normalize_text(text)
     if not txt.strip():
         return 0.0, []
 
-    idx = build_keyword_index()
+    idx = get_keyword_index()
+    need = _min_shared(idx, threshold)
     total_weight = 0.0
     hits = []
-    for term, tier in idx:
-        weight = TIER_WEIGHTS.get(tier, 1.0)
-        score = fuzz.partial_ratio(term.lower(), txt)
+    exact = pruned = fuzzy = 0
+    for j, (term, term_l, tier, weight) in enumerate(zip(idx.terms, idx.lowered, idx.tiers, idx.weights)):
+        if term_l and len(term_l) <= len(txt):
+            if term_l in txt:
+                # A verbatim occurrence is a perfect partial match.
+                exact += 1
+                score = 100.0
+            elif not _may_reach(idx.bigrams[j], need[j], txt):
+                pruned += 1
+                continue
+            else:
+                fuzzy += 1
+                score = fuzz.partial_ratio(term_l, txt)
+        else:
+            fuzzy += 1
+            score = fuzz.partial_ratio(term_l, txt)
         if score >= threshold:
             total_weight += weight
             hits.append({"term": term, "tier": tier, "match": score, "weight": weight})
+    with _stats_lock:
+        _prefilter_stats["exact"] += exact
+        _prefilter_stats["pruned"] += pruned
+        _prefilter_stats["fuzzy"] += fuzzy
     return total_weight, hits
 
+def match_matrix(texts, workers: int = -1, index: KeywordIndex = None):
+    """Raw partial_ratio of every keyword against every text, shape (len(texts), n_keywords).
+
+    Rows for blank texts stay 0, mirroring score_text's early return.
+    """
+    idx = index or get_keyword_index()
+    norm = [normalize_text(t) for t in texts]
+    matrix = np.zeros((len(norm), len(idx.terms)), dtype=np.float64)
+    live = [i for i, t in enumerate(norm) if t.strip()]
+    if live and idx.terms:
+        # cdist scores queries x choices; keep score_text's (term, text) argument order.
+        raw = process.cdist(idx.lowered, [norm[i] for i in live], scorer=fuzz.partial_ratio,
+                            dtype=np.float64, workers=workers)
+        matrix[live] = raw.T
+    return matrix
+
+def _weights(idx: KeywordIndex, tier_weights=None):
+    if tier_weights is None:
+        return idx.weights
+    return tuple(float(tier_weights.get(t, 1.0)) for t in idx.tiers)
+
+def rethreshold(matrix, threshold, tier_weights=None, index: KeywordIndex = None):
+    """Vectorized (totals, hit_mask) for a match matrix; no fuzzy matching involved."""
+    idx = index or get_keyword_index()
+    mask = matrix >= threshold
+    totals = mask @ np.asarray(_weights(idx, tier_weights), dtype=np.float64)
+    return totals, mask
+
+def score_from_matrix(matrix, threshold: int = 85, tier_weights=None, index: KeywordIndex = None):
+    """[(total, hits), ...] for each matrix row, in score_text's format."""
+    idx = index or get_keyword_index()
+    weights = _weights(idx, tier_weights)
+    results = []
+    for row, cols in zip(matrix, matrix >= threshold):
+        total_weight = 0.0
+        hits = []
+        for j in np.flatnonzero(cols):
+            total_weight += weights[j]
+            hits.append({"term": idx.terms[j], "tier": idx.tiers[j], "match": float(row[j]), "weight": weights[j]})
+        results.append((total_weight, hits))
+    return results
+
+@traced("score")
+def score_batch(texts, threshold: int = 85, workers: int = -1):
+    """Score many texts at once; returns [(total, hits), ...] identical to score_text per text."""
+    idx = get_keyword_index()
+    return score_from_matrix(match_matrix(texts, workers=workers, index=idx), threshold, index=idx)
+
+def resume_hash(text) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+@traced("score")
+def match_rows(candidate_ids, texts=None):
+    """Return (ids, index, matrix) of raw similarities for the given candidates.
+
+    Rows are loaded from candidate_matches when the resume hash and keyword set are
+    unchanged; the rest are computed in one batch and stored. `texts` may map
+    id -> resume_text to skip the fetch.
+    """
+    ids = list(dict.fromkeys(candidate_ids))
+    idx = get_keyword_index()
+    if texts is None:
+        texts = get_resume_texts(ids)
+    hashes = [resume_hash(texts.get(cid)) for cid in ids]
+    stored = get_candidate_matches(ids, idx.version)
+
+    matrix = np.zeros((len(ids), len(idx.terms)), dtype=np.float64)
+    stale = []
+    for i, cid in enumerate(ids):
+        row = stored.get(cid)
+        if row and row[0] == hashes[i]:
+            matrix[i] = np.frombuffer(row[1], dtype=np.float64)
+        else:
+            stale.append(i)
+    if stale:
+        fresh = match_matrix([texts.get(ids[i]) or "" for i in stale], index=idx)
+        matrix[stale] = fresh
+        rows_k, cols_j = np.nonzero(fresh >= INDEX_FLOOR)
+        save_candidate_matches(
+            ((ids[i], idx.version, hashes[i], fresh[k].tobytes()) for k, i in enumerate(stale)),
+            postings=[(idx.version, idx.terms[j], ids[stale[k]], float(fresh[k, j])) for k, j in zip(rows_k, cols_j)],
+        )
+    return ids, idx, matrix
+
+@traced("score")
+def score_candidates(candidate_ids, threshold: int = 85, texts=None):
+    """Return {candidate_id: (total, hits)}, reusing stored scores where possible.
+
+    Only candidates whose resume text or the keyword set changed since their last
+    stored score at this threshold are rescored (from stored match rows when those
+    are still current); fresh results are written back.
+    `texts` may map id -> resume_text to skip the fetch.
+    """
+    ids = list(dict.fromkeys(candidate_ids))
+    idx = get_keyword_index()
+    if texts is None:
+        texts = get_resume_texts(ids)
+    hashes = {cid: resume_hash(texts.get(cid)) for cid in ids}
+    stored = get_candidate_scores(ids, idx.version, threshold)
+
+    results = {}
+    stale = []
+    for cid in ids:
+        row = stored.get(cid)
+        if row and row["resume_hash"] == hashes[cid]:
+            results[cid] = (row["score"], row["hits"])
+        else:
+            stale.append(cid)
+    if stale:
+        stale, idx, matrix = match_rows(stale, texts=texts)
+        fresh = score_from_matrix(matrix, threshold, index=idx)
+        save_candidate_scores((cid, idx.version, threshold, hashes[cid], total, hits)
+                              for cid, (total, hits) in zip(stale, fresh))
+        results.update(zip(stale, fresh))
+    audit.record("score", candidates=len(ids), rescored=len(stale), threshold=threshold,
+                 keyword_version=idx.version)
+    return {cid: results[cid] for cid in ids}
+
+# --- Campaign ranking ---
+@traced("score")
+def refresh_match_index(batch_size: int = 2000, max_batches: int = None):
+    """Score candidates missing from the keyword index for the current keyword set.
+
+    Returns how many candidates were indexed; safe to call repeatedly or stop early.
+    """
+    idx = get_keyword_index()
+    drop_stale_postings(idx.version)
+    done = batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = unindexed_candidate_ids(idx.version, limit=batch_size)
+        if not ids:
+            break
+        match_rows(ids)
+        done += len(ids)
+        batches += 1
+    audit.record("match_index_refresh", indexed=done, keyword_version=idx.version)
+    return done
+
+@traced("score")
+def unindexed_count() -> int:
+    """Candidates refresh_match_index() has not covered for the current keyword set (a full anti-join)."""
+    return count_unindexed_candidates(get_keyword_index().version)
+
+def rank_candidates_for_campaign(campaign, k: int = 10, threshold: int = 85, is_test=None,
+                                 count_unindexed: bool = False):
+    """Top-k candidates for a campaign, weighted by the existing keyword tiers.
+
+    `campaign` is a campaign id (terms come from campaign_keywords in one indexed join)
+    or an ad-hoc "A; B, C" keyword string. Reads the keyword -> candidate index instead
+    of rescoring resumes. Returns {"results": [...], "missing": terms not in the keyword
+    set, "unindexed": unindexed_count() when count_unindexed is set, else None}.
+    """
+    idx = get_keyword_index()
+    threshold = max(threshold, INDEX_FLOOR)
+    missing = []
+    if isinstance(campaign, int):
+        tier_weights = dict(zip(idx.tiers, idx.weights)) or dict(TIER_WEIGHTS)
+        results = top_candidates_for_campaign(idx.version, campaign, tier_weights, threshold, limit=k, is_test=is_test)
+        missing = campaign_missing_terms(campaign)
+    else:
+        by_lower = {t: j for j, t in enumerate(idx.lowered)}
+        weighted = []
+        for term in split_keywords(campaign):
+            j = by_lower.get(term.lower())
+            if j is None:
+                missing.append(term)
+            else:
+                weighted.append((idx.terms[j], idx.weights[j]))
+        results = top_candidates_for_terms(idx.version, weighted, threshold, limit=k, is_test=is_test)
+    return {
+        "results": results,
+        "missing": missing,
+        "unindexed": count_unindexed_candidates(idx.version) if count_unindexed else None,
+    }
+
 def add_new_keyword(term: str, tier: int = 2, notes: str = None):
-    add_keyword(term, tier, notes)
\ No newline at end of file
+    add_keyword(term, tier, notes)
+    audit.record("keyword_add", term=term, tier=tier)
\ No newline at end of file